@@ -1,224 +1,1123 @@
+import math
 import random
-import copy
+import threading
+import time
 import numpy as np
 
 from Config import *
+from Bitboard import hasLine, successors, threats, winners
+from Book import Book
+from EvalStore import EvalStore
+from MCTS import MCTS
+from NTuple import NTuple
+from TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER, DEPTH, FLAG, SCORE, MOVE
 
 
-def coup_AI(plateau, playerNumber, line=None, column=None, direction=None):
-    """
-    Simule le coup d'un joueur sur un plateau
+# Fenêtre nulle de la recherche de variation principale : plus petite que
+# l'écart entre deux scores différents (les heuristiques ne sont pas entières)
+NULL_WINDOW = 1e-6
 
-    Entrées :
-        plateau [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
-        playerNumber [int] : numéro du joueur
-        line [int] : coordonnée de la ligne
-        column [int] : coordonnée de la colonne
-        direction [+1 ou -1] : direction du décalage
-    """
 
-    board = copy.deepcopy(plateau)
+class SearchTimeout(Exception):
+    """Levée dans la recherche quand le temps accordé à l'ia est écoulé"""
 
-    if line != None and column != None:  # Coordonnées case
 
-        board[line][column] = playerNumber
+class AI():
+    def __init__(self, app, timeLimit=AI_TIME-AI_MARGIN, tableEntries=TT_ENTRIES, geometry=None):
+        """
+        Initialise l'IA basé sur app
+
+        Entrées :
+            app [App] : partie en cours (None pour une ia sans partie, dans un processus de recherche)
+            timeLimit [float] : temps accordé à chaque coup (s)
+            tableEntries [int] : taille de la table de transposition (0 pour ne pas en utiliser)
+            geometry [Geometry] : variante du plateau quand app est None
+        """
 
-    elif line != None and direction != None:  # Décalage
+        self.app = app
+        self.geometry = app.geometry if app is not None else geometry
+        self.mode = self.app.getPlayerMode() if app is not None else -1
+        self.timeLimit = timeLimit
+        self.maxDepth = None  # Profondeur maximale de la recherche (limitée par le temps seulement si absente)
+        self.deadline = None
+        self.depth = 0
+        self.searchDepth = 0  # Profondeur terminée par la dernière recherche (hors livre et base)
+        self.iterations = []  # (profondeur, coup, score) de chaque profondeur terminée
+        self.stats = None  # Statistiques du dernier coup (voir moveStats)
 
-        board[line] = np.roll(board[line], direction)
+        # Les scores dépendent du mode de l'ia : la table est vidée s'il change (voir newSearch)
+        self.table = TranspositionTable(tableEntries) if tableEntries else None
+        self.tableMode = None
+        self.rootKey = 0
 
-    return board
+        # Tri des coups : coups meurtriers par distance à la racine et historique des coupures
+        self.ordering = True
+        self.killers = {}
+        self.history = {}
 
+        # Les feuilles sont évaluées avec les cases par ligne tenues à jour par
+        # GameState. Aux positions à un coup des feuilles, les coups qui suivent
+        # les AI_BATCH_AFTER premiers sont évalués en une seule passe numpy (voir negamax)
+        self.incremental = True
+        self.batch = True
 
-class AI():
-    def __init__(self, app):
-        """Initialise l'IA basé sur app"""
+        # Menaces (voir Bitboard.threats) : une victoire en un coup est jouée sans
+        # chercher, et face à une victoire de l'adversaire au coup suivant seuls
+        # les coups qui peuvent la bloquer sont cherchés
+        self.threats = True
 
-        self.app = app
-        self.mode = self.app.getPlayerMode()
+        # Variation principale : coups attendus depuis la racine, et position
+        # attendue au prochain tour avec la suite de la variation
+        self.pvs = True
+        self.aspiration = True
+        self.pvLine = []
+        self.pvNext = None
+
+        # Livre d'ouvertures (voir BookBuilder.py) et résultats gardés d'une partie à l'autre
+        self.book = True
+        self.evalStore = EVAL_STORE
+
+        self.rootPlayer = None
+        self.heuristique = None
+        self.network = None  # Evaluation n-uplet du mode -5 (voir NTupleTrainer.py)
+        self.winScore = WIN
+
+        # Monte-Carlo (mode -4), créé au premier coup et gardé pour réutiliser l'arbre
+        self.mcts = None
+
+        # Réflexion pendant le tour de l'adversaire (voir ponder)
+        self.ponderThread = None
+        self.ponderStop = None
+        self.ponderHash = None
+        self.ponderStart = None
+        self.ponderResult = None
+        self.ponderHits = 0  # Réponses de l'adversaire attendues par ponder
+        self.ponderMisses = 0
+
+        # Recherches interrompues depuis un autre fil (voir cancel)
+        self.cancelled = False
+
+        self.resetCounters()
 
     def play(self):
         """
-        Jouer le coup en tant qu'ia
+        Jouer le coup en tant qu'ia (statistiques du coup dans self.stats)
 
         Sorties :
             [(line, column, direction)] : tuple du coup
         """
 
-        if self.mode == -1:
-            return self.alphaBeta(self.app.getBoard(), self.app.getCurrentPlayer())[0]
-        elif self.mode == -2:
-            self.heuristique = self.heuristique_max
-            return self.alphaBetaHeuristique(self.app.getBoard(), self.app.getCurrentPlayer())[0]
-        elif self.mode == -3:
-            self.heuristique = self.heuristique_mean
-            return self.alphaBetaHeuristique(self.app.getBoard(), self.app.getCurrentPlayer())[0]
+        startTime = time.monotonic()
+        # La recherche se fait sur une copie : le plateau de la partie n'est jamais modifié
+        state = self.app.getState()
+        move, source = self.chooseMove(state)
+        self.stats = self.moveStats(state, move, source, time.monotonic() - startTime)
+
+        return move
 
-    def alphaBeta(self, board, player, depth=2, maxi=True):
+    def chooseMove(self, state):
         """
-        IA AlphaBeta
+        Choisit le coup : livre, base des résultats, réflexion pendant le tour
+        de l'adversaire puis recherche
 
         Entrées :
-            board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
-            player [int] : numéro du joueur
-            depth [int] : profondeur d'itération
-            maxi [bool] : maximise le joueur actuel
+            state [GameState] : état de la partie (copie)
 
         Sorties :
-            [(score, (line, column, direction))] : la meilleur coup avec son score
+            [((line, column, direction), str)] : coup avec son origine
+                ('book', 'store', 'ponder', 'search' ou 'mcts')
         """
 
-        otherPlayer = (player % 2)+1
+        pondered = self.stopPondering(state)
+        self.resetCounters()
 
-        if depth == 0:
-            AI_tie, AI_win_player = self.app.getWinner(board)
-            if AI_win_player == player:
-                res = WIN
-            elif AI_win_player == otherPlayer:
-                res = LOSS
-            else:
-                res = DRAW
+        if self.mode == -4:
+            if self.mcts is None:
+                self.mcts = MCTS(self.timeLimit)
+                self.mcts.cancelled = self.cancelled
+            move = self.mcts.search(state)[0]
+            self.nodes = self.mcts.done
+            return move, 'mcts'
+
+        self.setMode(self.mode)
+
+        move, source = self.bookMove(state), 'book'
+        if move is None:
+            move, source = self.storedMove(state), 'store'
+        if move is not None:
+            self.pvLine = []  # Pas de réponse attendue à chercher pendant le tour de l'adversaire
+            return move, source
+
+        position = state.copy() if self.evalStore else None
+        timeLimit = self.timeLimit
+        if pondered is not None:
+            # L'adversaire a joué le coup attendu : la recherche a déjà commencé
+            best, depth, elapsed = pondered
+            if elapsed >= timeLimit:
+                self.depth = depth
+                self.storeResult(position, best)
+                return best[0], 'ponder'
+            timeLimit -= elapsed
+
+        source = 'search' if pondered is None else 'ponder'
+        best = self.iterativeDeepening(state, maxDepth=self.maxDepth, timeLimit=timeLimit)
+        if pondered is not None and depth > self.depth:
+            best = pondered[0]
+            self.depth = depth
+        self.storeResult(position, best)
+
+        return best[0], source
+
+    def resetCounters(self):
+        """Remet à zéro les compteurs de la recherche (voir counters)"""
+
+        self.nodes = 0
+        self.evaluations = 0
+        self.cutoffs = 0
+        self.tableCounts = (self.table.hits, self.table.misses) if self.table is not None else (0, 0)
+
+    def counters(self):
+        """
+        Donne les compteurs de la dernière recherche
+
+        Sorties :
+            [dict] : noeuds visités ('nodes'), feuilles évaluées ('evaluations'), recherches
+                dans la table de transposition ('probes') et trouvées ('hits'), coupures ('cutoffs')
+        """
+
+        hits, misses = (self.table.hits, self.table.misses) if self.table is not None else (0, 0)
+        hits -= self.tableCounts[0]
+        misses -= self.tableCounts[1]
+
+        return {"nodes": self.nodes, "evaluations": self.evaluations,
+                "probes": hits + misses, "hits": hits, "cutoffs": self.cutoffs}
+
+    def moveStats(self, state, move, source, elapsed):
+        """
+        Statistiques d'un coup de l'ia (barre d'état, App.addStatsHook)
+
+        Entrées :
+            state [GameState] : état de la partie avant le coup
+            move [(line, column, direction)] : coup joué
+            source [str] : origine du coup (voir chooseMove)
+            elapsed [float] : durée du coup (s)
+
+        Sorties :
+            [dict] : compteurs (voir counters) avec le joueur ('player'), le niveau ('mode'),
+                le coup ('move'), son origine ('source'), sa durée ('time'), la profondeur
+                terminée ('depth'), les noeuds par seconde ('nps'), la part des recherches
+                trouvées dans la table ('hitRate') et le facteur de branchement effectif
+                ('branching', noeuds ** (1 / profondeur))
+        """
+
+        stats = self.counters()
+        nodes, depth = stats["nodes"], self.depth if source != 'mcts' else None
+        stats.update({
+            "player": state.playerNumber,
+            "mode": self.mode,
+            "move": move,
+            "source": source,
+            "time": elapsed,
+            "depth": depth,
+            "nps": nodes / elapsed if elapsed > 0 else 0.0,
+            "hitRate": stats["hits"] / stats["probes"] if stats["probes"] else 0.0,
+            "branching": nodes ** (1 / depth) if depth and nodes else None,
+        })
+
+        return stats
+
+    def cancel(self, cancelled=True):
+        """
+        Interrompt la recherche en cours depuis un autre fil : elle donne le
+        meilleur coup déjà trouvé. Les recherches suivantes le sont aussi
+        jusqu'à cancel(False).
+
+        Entrées :
+            cancelled [bool] : False pour permettre à nouveau les recherches
+        """
+
+        self.cancelled = cancelled
+        if self.mcts is not None:
+            self.mcts.cancelled = cancelled
+
+    def ponder(self, state):
+        """
+        Pendant le tour de l'adversaire, cherche (dans un fil) la position après
+        sa réponse attendue, le deuxième coup de la variation principale.
+        play reprend la recherche si l'adversaire la joue ; sinon la table de
+        transposition garde ce qui a été cherché.
+
+        Entrées :
+            state [GameState] : état de la partie, l'adversaire doit jouer
+        """
+
+        self.stopPondering()
+
+        if self.mode not in [-1, -2, -3, -5] or len(self.pvLine) < 2 or self.pvLine[1] not in state.getValid():
+            return
+
+        state = state.copy()
+        state.make(self.pvLine[1])
+        if state.getWinner()[1] != None:
+            return
+
+        self.setMode(self.mode)
+        self.cancel(False)
+        self.ponderHash = state.positionHash()
+        self.ponderStop = threading.Event()
+        self.ponderStart = time.monotonic()
+        self.ponderResult = None
+        self.ponderThread = threading.Thread(target=self.ponderSearch, args=(state,), daemon=True)
+        self.ponderThread.start()
+
+    def ponderSearch(self, state):
+        """
+        Recherche du fil de ponder, sans limite de temps jusqu'à stopPondering
+
+        Entrées :
+            state [GameState] : état de la partie après la réponse attendue
+        """
+
+        best = self.iterativeDeepening(state, timeLimit=INFINITE)
+        self.ponderResult = (best, self.depth)
+
+    def stopPondering(self, state=None):
+        """
+        Arrête la recherche du fil de ponder
+
+        Entrées :
+            state [GameState] : état de la partie après la réponse de l'adversaire
+
+        Sorties :
+            [(((line, column, direction), score), int, float)] : (meilleur coup avec son score,
+                profondeur, temps de recherche) si la position cherchée est state, sinon None
+        """
+
+        if self.ponderThread is None:
+            return None
+
+        self.ponderStop.set()
+        self.ponderThread.join()
+        self.ponderThread = None
+        self.ponderStop = None
+        elapsed = time.monotonic() - self.ponderStart
+
+        if state is None:
+            return None
+        if self.ponderResult is None or state.positionHash() != self.ponderHash:
+            self.ponderMisses += 1
+            return None
+
+        (move, score), depth = self.ponderResult
+        if not depth or move not in state.getValid():
+            self.ponderMisses += 1
+            return None
+        self.ponderHits += 1
 
-            return (None, res)
+        # La recherche suivante part de la variation trouvée
+        self.pvNext = (self.ponderHash, self.pvLine)
 
-        meilleurscore = -INFINITE if maxi else +INFINITE
-        meilleurcoup = []
+        return ((move, score), depth, elapsed)
 
-        caseCoup = [(line, column, None)
-                    for line, column in self.app.getValidCase()]
-        shiftCoup = [(line, None, direction)
-                     for line, direction in self.app.getValidShift(-1)]
-        shiftCoup += [(line, None, direction)
-                      for line, direction in self.app.getValidShift(+1)]
+    def bookMove(self, state):
+        """
+        Cherche la position dans le livre d'ouvertures du niveau de l'ia
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [(line, column, direction)] : coup du livre (None si la position n'y est pas)
+        """
+
+        book = Book.open(self.geometry, self.mode) if self.book else None
+        if book is None:
+            return None
 
-        for coup in caseCoup + shiftCoup:
-            board, pres = self.app.setCoup(board, line=coup[0],
-                                           column=coup[1], playerNumber=player, direction=coup[2])
+        entry = book.lookup(state)
+        # Le livre ne connaît pas les répétitions : son coup peut être interdit ici
+        if entry is None or entry[0] not in state.getValid():
+            return None
 
-            score = self.alphaBeta(
-                board, otherPlayer, depth=depth-1, maxi=not maxi)[1]
+        self.depth = entry[2]
+        self.nodes = 0
 
-            board, pres = self.app.setCoup(board, line=coup[0],
-                                           column=coup[1], playerNumber=pres, direction=(+1 if coup[2] == -1 else -1))
+        return entry[0]
 
-            if (maxi and score > meilleurscore) or (not maxi and score < meilleurscore):
-                meilleurscore = score
-                meilleurcoup = [(coup, score)]
-            elif meilleurscore == score:
-                meilleurcoup.append((coup, score))
+    def storedMove(self, state):
+        """
+        Cherche la position dans les résultats gardés d'une partie à l'autre.
+        Un résultat n'est joué que s'il est au moins aussi profond que la
+        dernière recherche de l'ia, sinon une nouvelle recherche le remplacera.
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [(line, column, direction)] : coup rangé (None si absent ou trop peu profond)
+        """
+
+        if not self.evalStore:
+            return None
+
+        entry = EvalStore.open().lookup(state, self.mode)
+        if entry is None or entry[2] < self.searchDepth or entry[0] not in state.getValid():
+            return None
+
+        self.depth = entry[2]
+        self.nodes = 0
+
+        return entry[0]
+
+    def storeResult(self, state, best):
+        """
+        Range le résultat d'une recherche pour les parties suivantes
+
+        Entrées :
+            state [GameState] : état de la partie avant la recherche
+            best [((line, column, direction), score)] : résultat de la recherche
+        """
+
+        if self.evalStore and best[1] is not None and self.depth:
+            EvalStore.open().store(state, self.mode, self.depth, best[0], best[1])
+
+    def setMode(self, mode):
+        """
+        Choisit l'évaluation des feuilles selon le niveau de l'ia
+
+        Entrées :
+            mode [int] : -1 victoire / défaite seulement, -2 heuristique_max, -3 heuristique_mean,
+                -5 heuristique_ntuple (heuristique_mean sans tables apprises)
+        """
+
+        self.mode = mode
+        self.network = NTuple.open(self.geometry) if mode == -5 else None
+        if mode == -1:
+            self.heuristique = None
+            self.winScore = WIN
+        else:
+            if self.network is not None:
+                self.heuristique = self.heuristique_ntuple
             else:
+                self.heuristique = self.heuristique_max if mode == -2 else self.heuristique_mean
+            self.winScore = HEURISTIC_WIN
+
+    def iterativeDeepening(self, state, maxDepth=None, moves=None, timeLimit=None):
+        """
+        Recherche à la profondeur 1, 2, 3, ... jusqu'à la fin du temps accordé
+
+        Entrées :
+            state [GameState] : état de la partie (inutilisable après une recherche interrompue)
+            maxDepth [int] : profondeur maximale (illimitée si absente)
+            moves [[(line, column, direction)]] : coups cherchés à la racine (tous si absent)
+            timeLimit [float] : temps accordé (self.timeLimit si absent)
+
+        Sorties :
+            [((line, column, direction), score)] : meilleur coup de la dernière profondeur terminée
+        """
+
+        self.deadline = time.monotonic() + (self.timeLimit if timeLimit is None else timeLimit)
+        self.depth = 0
+        self.iterations = []
+        self.newSearch(state)
+
+        valid = state.getValid() if moves is None else moves
+        best = (valid[0], None) if valid else ((None, None, None), None)
+
+        if self.threats and valid:
+            win = self.winningMove(state, valid)
+            if win is not None:
+                # Victoire en un coup : jouée sans chercher
+                self.depth = self.searchDepth = 1
+                self.iterations = [(1, win, self.winScore)]
+                self.pvLine = [win]
+                self.deadline = None
+                return (win, self.winScore)
+            if moves is None:
+                valid = self.blockingMoves(state, valid) or valid  # Un seul blocage est joué sans chercher
+                best = (valid[0], None)
+
+        depth = 1
+        while (len(valid) > 1 or moves) and (maxDepth is None or depth <= maxDepth):
+            try:
+                best = self.aspirationSearch(state, depth, best[1], moves)
+            except SearchTimeout:
+                # make / unmake n'ont pas été appariés : l'état n'est plus fiable
                 break
+            self.depth = depth
+            self.iterations.append((depth,) + best)
+            self.pvLine = self.principalVariation(state, depth)
+
+            if abs(best[1]) >= self.winScore:
+                break  # Victoire ou défaite forcée : chercher plus loin ne change rien
+            depth += 1
+
+        self.deadline = None
+        self.searchDepth = self.depth
 
-        return random.choice(meilleurcoup)
+        return best
 
-    def alphaBetaHeuristique(self, board, playerNumber, depth=2, maxi=True):
+    def aspirationSearch(self, state, depth, previous, moves=None):
         """
-        IA AlphaBeta avec une fonction heuristique
+        Cherche dans une fenêtre autour du score de la profondeur précédente,
+        puis dans la fenêtre complète si le score en sort
 
         Entrées :
-            board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
-            player [int] : numéro du joueur
+            state [GameState] : état de la partie
             depth [int] : profondeur d'itération
-            maxi [bool] : maximise le joueur actuel
+            previous [int] : score de la profondeur précédente (ou None)
+            moves [[(line, column, direction)]] : coups cherchés à la racine (tous si absent)
 
         Sorties :
-            [(score, (line, column, direction))] : la meilleur coup avec son score
+            [((line, column, direction), score)] : le meilleur coup avec son score
         """
 
-        otherPlayer = (playerNumber % 2)+1
+        if self.aspiration and previous is not None:
+            delta = AI_ASPIRATION*self.winScore
+            alpha, beta = previous-delta, previous+delta
+            best = self.search(state, depth, alpha, beta, moves)
+            if alpha < best[1] < beta:
+                return best
+
+        return self.search(state, depth, moves=moves)
+
+    def principalVariation(self, state, depth):
+        """
+        Suit les meilleurs coups de la table de transposition depuis la racine
+
+        Entrées :
+            state [GameState] : état de la partie (rendu inchangé)
+            depth [int] : longueur maximale
+
+        Sorties :
+            [[(line, column, direction)]] : variation principale
+        """
+
+        if self.table is None:
+            return []
+
+        line = []
+        tokens = []
+        while len(line) < depth:
+            entry = self.table.peek(state.positionHash() ^ self.rootKey)
+            if entry is None or entry[MOVE] not in state.getValid():
+                break
+            line.append(entry[MOVE])
+            tokens.append(state.make(entry[MOVE]))
+            if len(line) == 2:
+                self.pvNext = (state.positionHash(), [])
+
+        if len(line) > 2:
+            self.pvNext = (self.pvNext[0], line[2:])
+
+        for token in reversed(tokens):
+            state.unmake(token)
+
+        return line
+
+    def newSearch(self, state):
+        """
+        Prépare une recherche depuis state (table de transposition, tri des coups)
+
+        Entrées :
+            state [GameState] : état de la partie à la racine
+        """
+
+        self.rootPlayer = state.playerNumber
+
+        # L'adversaire a joué le coup attendu : la variation précédente reste en tête
+        if self.pvNext is not None and self.pvNext[0] == state.positionHash():
+            self.pvLine = self.pvNext[1]
+        else:
+            self.pvLine = []
+        self.pvNext = None
+        self.killers = {}
+        for move in self.history:
+            self.history[move] //= 2
+
+        if self.table is not None:
+            if self.mode != self.tableMode:
+                if self.tableMode is not None:
+                    self.table.clear()
+                self.tableMode = self.mode
+            self.table.newSearch()
+        self.resetCounters()
+
+        # Les scores sont ceux du joueur de la racine : il fait partie du hash
+        self.rootKey = self.geometry.zobristRoot if state.playerNumber == 2 else 0
+
+    def checkTime(self):
+        """Interrompt la recherche si le temps accordé est écoulé (ou si cancel ou stopPondering l'arrête)"""
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SearchTimeout()
+        if self.cancelled or (self.ponderStop is not None and self.ponderStop.is_set()):
+            raise SearchTimeout()
+
+    def search(self, state, depth, alpha=-INFINITE, beta=+INFINITE, moves=None):
+        """
+        Cherche le meilleur coup à profondeur fixe (appeler newSearch avant)
+
+        Entrées :
+            state [GameState] : état de la partie (joué puis annulé avec make / unmake)
+            depth [int] : profondeur d'itération
+            alpha [int] : borne basse de la fenêtre
+            beta [int] : borne haute de la fenêtre
+            moves [[(line, column, direction)]] : coups cherchés (tous, dans le désordre, si absent)
+
+        Sorties :
+            [((line, column, direction), score)] : le meilleur coup avec son score
+        """
+
+        subset = moves is not None
+        if not subset:
+            # Les coups de même valeur sont départagés au hasard
+            moves = state.getValid()
+            random.shuffle(moves)
+            if self.threats:
+                moves = self.blockingMoves(state, moves) or moves
+
+        alphaOrig = alpha
+        best = (moves[0], -INFINITE)
+        for move in self.orderMoves(state, moves, self.tableMove(state), 0, self.pvMove(0)):
+            token = state.make(move)
+            score = self.searchChild(state, depth, alpha, beta, 0, best[1] == -INFINITE,
+                                     move == self.pvMove(0))
+            state.unmake(token)
+
+            if score > best[1]:
+                best = (move, score)
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if self.table is not None and not subset:  # Une partie des coups ne donne pas le score de la position
+            flag = UPPER if best[1] <= alphaOrig else LOWER if best[1] >= beta else EXACT
+            self.table.store(state.positionHash() ^ self.rootKey, depth, flag, best[1], best[0])
+
+        return best
+
+    def searchChild(self, state, depth, alpha, beta, ply, first, onPv):
+        """
+        Cherche le coup qui vient d'être joué : le premier coup dans la fenêtre
+        complète, les suivants dans une fenêtre nulle, recherchés à nouveau
+        s'ils dépassent alpha (recherche de variation principale)
+
+        Entrées :
+            state [GameState] : état de la partie après le coup
+            depth [int] : profondeur restante avant le coup
+            alpha [int] : borne basse de la fenêtre
+            beta [int] : borne haute de la fenêtre
+            ply [int] : distance à la racine avant le coup
+            first [bool] : premier coup cherché
+            onPv [bool] : le coup suit la variation principale
+
+        Sorties :
+            [int] : score du coup pour le joueur qui l'a joué
+        """
+
+        if first or not self.pvs:
+            return -self.negamax(state, depth-1, -beta, -alpha, ply+1, onPv)
+
+        score = -self.negamax(state, depth-1, -alpha-NULL_WINDOW, -alpha, ply+1, onPv)
+        if alpha < score < beta:
+            score = -self.negamax(state, depth-1, -beta, -alpha, ply+1, onPv)
+
+        return score
+
+    def pvMove(self, ply):
+        """Donne le coup de la variation principale à cette distance de la racine (ou None)"""
+
+        return self.pvLine[ply] if ply < len(self.pvLine) else None
+
+    def negamax(self, state, depth, alpha, beta, ply, onPv=False):
+        """
+        Recherche alpha-bêta du point de vue du joueur qui doit jouer
+
+        Entrées :
+            state [GameState] : état de la partie (joué puis annulé avec make / unmake)
+            depth [int] : profondeur restante
+            alpha [int] : score déjà assuré au joueur qui doit jouer
+            beta [int] : score au-delà duquel l'adversaire évite cette position
+            ply [int] : distance à la racine
+            onPv [bool] : la position est sur la variation principale
+
+        Sorties :
+            [int] : score de la position
+        """
+
+        self.nodes += 1
+        self.checkTime()
+
+        # Une victoire termine la partie : make ne vérifie que les lignes touchées par le coup
+        AI_tie, AI_win_player = state.getWinner()
+        if AI_win_player != None:
+            return self.winScore if AI_win_player == state.playerNumber else -self.winScore
 
         if depth == 0:
-            return (None, self.heuristique(board, playerNumber if maxi else otherPlayer))
+            return self.evaluate(state)
+
+        if self.threats and self.winningCells(state):
+            return self.winScore
+
+        alphaOrig = alpha
+        ttMove = None
+        if self.table is not None:
+            h = state.positionHash() ^ self.rootKey
+            entry = self.table.probe(h)
+            if entry is not None:
+                ttMove = entry[MOVE]
+                if entry[DEPTH] >= depth:
+                    if entry[FLAG] == EXACT:
+                        return entry[SCORE]
+                    elif entry[FLAG] == LOWER:
+                        alpha = max(alpha, entry[SCORE])
+                    else:
+                        beta = min(beta, entry[SCORE])
+                    if alpha >= beta:
+                        return entry[SCORE]
+
+        moves = state.getValid()
+        if not moves:
+            return DRAW
+
+        if self.threats:
+            moves = self.blockingMoves(state, moves)
+            if not moves:
+                return -self.winScore
+
+        pvMove = self.pvMove(ply) if onPv else None
+        moves = self.orderMoves(state, moves, ttMove, ply, pvMove)
+        batch = depth == 1 and len(moves) > AI_BATCH_AFTER and self.batchLeaves()
+
+        best, bestMove = -INFINITE, None
+        for move in moves[:AI_BATCH_AFTER] if batch else moves:
+            token = state.make(move)
+            score = self.searchChild(state, depth, alpha, beta, ply, bestMove is None,
+                                     pvMove is not None and move == pvMove)
+            state.unmake(token)
+
+            if score > best:
+                best, bestMove = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.addCutoff(move, depth, ply)
+                        break
+
+        if batch and alpha < beta:
+            # Les premiers coups triés n'ont pas coupé : les autres seront
+            # sans doute tous cherchés, ils sont évalués en une seule passe
+            score, move = self.evaluateChildren(state, moves[AI_BATCH_AFTER:])
+            if score > best:
+                best, bestMove = score, move
+                if score >= beta:
+                    self.addCutoff(move, depth, ply)
 
-        meilleurscore = -INFINITE if maxi else +INFINITE
-        meilleurcoup = []
+        if self.table is not None:
+            flag = UPPER if best <= alphaOrig else LOWER if best >= beta else EXACT
+            self.table.store(h, depth, flag, best, bestMove)
 
-        valid = self.app.getValid()
+        return best
 
-        for coup in valid:
-            board, pres = self.app.setCoup(board, line=coup[0],
-                                           column=coup[1], playerNumber=playerNumber, direction=coup[2])
+    def winningCells(self, state):
+        """
+        Donne les cases où le joueur qui doit jouer gagne en posant un pion. Le
+        plateau obtenu a un gagnant : il ne peut pas avoir déjà été joué.
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [int] : masque des cases
+        """
+
+        board = state.board
+        mask = board.masks[state.playerNumber]
+        free = board.cells & ~mask
+        line, column = state.last_play["line"], state.last_play["column"]
+        if column != None:
+            free &= ~(1 << (line*self.geometry.stride + column))
 
-            score = self.alphaBetaHeuristique(
-                board, otherPlayer, depth=depth-1, maxi=not maxi)[1]
+        return threats(mask, free, self.geometry)[0]
 
-            board, pres = self.app.setCoup(board, line=coup[0],
-                                           column=coup[1], playerNumber=pres, direction=(+1 if coup[2] == -1 else -1))
+    def winningMove(self, state, moves):
+        """
+        Cherche parmi moves un pion posé qui fait gagner le joueur qui doit jouer
+
+        Entrées :
+            state [GameState] : état de la partie
+            moves [[(line, column, direction)]] : coups valides
 
-            if (maxi and score > meilleurscore) or (not maxi and score < meilleurscore):
-                meilleurscore = score
-                meilleurcoup = [(coup, score)]
-            elif meilleurscore == score:
-                meilleurcoup.append((coup, score))
+        Sorties :
+            [(line, column, direction)] : premier coup gagnant (None s'il n'y en a pas)
+        """
+
+        cells = self.winningCells(state)
+        if not cells:
+            return None
+
+        stride = self.geometry.stride
+        for move in moves:
+            if move[1] != None and cells >> (move[0]*stride + move[1]) & 1:
+                return move
+
+        return None
+
+    def blockingMoves(self, state, moves):
+        """
+        Garde les coups qui peuvent empêcher l'adversaire de gagner au coup
+        suivant en posant un pion : poser dans chacun de ses segments presque
+        complets (la case jouée lui est interdite au coup suivant), décaler une
+        ligne qu'ils traversent tous, ou gagner par un décalage. Les autres coups perdent.
+
+        Entrées :
+            state [GameState] : état de la partie
+            moves [[(line, column, direction)]] : coups valides
+
+        Sorties :
+            [[(line, column, direction)]] : coups gardés (tous si l'adversaire n'a pas de menace)
+        """
+
+        board = state.board
+        mask = board.masks[(state.playerNumber % 2)+1]
+        cells, common, lines = threats(mask, board.cells & ~mask, self.geometry)
+        if not cells:
+            return moves
+
+        stride = self.geometry.stride
+        kept = []
+        for move in moves:
+            line, column, direction = move
+            if column != None:
+                if common >> (line*stride + column) & 1:
+                    kept.append(move)
+            elif lines >> line & 1:
+                kept.append(move)
             else:
-                break
+                # Le décalage laisse les menaces en place : il ne compte que s'il termine la partie
+                token = state.make(move)
+                if state.getWinner()[1] != None:
+                    kept.append(move)
+                state.unmake(token)
+
+        return kept
+
+    def evaluate(self, state):
+        """
+        Evalue une feuille du point de vue du joueur qui doit jouer
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [int] : score de la position
+        """
+
+        self.evaluations += 1
+        if self.heuristique is None:
+            return DRAW
+
+        # L'évaluation n-uplet dépend du joueur qui doit jouer : elle est directement de son point de vue
+        if self.network is not None:
+            if self.incremental:
+                return 100*math.tanh(state.tupleScore(self.network))
+            return self.heuristique(state.getBoard(), state.playerNumber)
+
+        # Les heuristiques évaluent toujours le plateau pour le joueur de la racine
+        if self.incremental:
+            score = self.heuristique(None, self.rootPlayer, state.lineCounts(self.rootPlayer))
+        else:
+            score = self.heuristique(state.getBoard(), self.rootPlayer)
+
+        return score if state.playerNumber == self.rootPlayer else -score
 
-        return random.choice(meilleurcoup)
+    def batchLeaves(self):
+        """Indique si les positions à un coup des feuilles sont évaluées avec evaluateChildren"""
 
-    def heuristique_max(self, board, playerNumber):
-        """Evalue la probabilité que le player a de gagner sur cette board"""
+        return self.batch and self.heuristique is not None
 
+    def evaluateChildren(self, state, moves):
+        """
+        Evalue toutes les positions obtenues par moves en une seule passe
+        (même score que negamax à la profondeur 1, sans coupure)
+
+        Entrées :
+            state [GameState] : état de la partie
+            moves [[(line, column, direction)]] : coups valides
+
+        Sorties :
+            [(int, (line, column, direction))] : meilleur score du joueur qui doit jouer avec son coup
+        """
+
+        self.nodes += len(moves)
+        self.evaluations += len(moves)
+
+        if self.incremental and self.network is None:
+            # Cases par ligne des positions obtenues, depuis celles tenues à jour par GameState
+            (ccp, clp, cco, clo), winner = self.childCounts(state, moves)
+            scores = self.heuristique(None, self.rootPlayer, (ccp, clp, cco, clo))
+            if state.playerNumber != self.rootPlayer:
+                scores = -scores
+        else:
+            boards = successors(state.getBoard(), moves, state.playerNumber)
+            if self.network is not None:
+                scores = self.heuristique(boards, state.playerNumber, toMove=(state.playerNumber % 2)+1)
+            else:
+                scores = self.heuristique(boards, self.rootPlayer)
+                if state.playerNumber != self.rootPlayer:
+                    scores = -scores
+            winner = winners(boards, self.geometry)
+
+        # Une victoire termine la partie, quel que soit le score de l'heuristique
+        scores = np.where(winner == state.playerNumber, self.winScore,
+                          np.where(winner == 0, scores, -self.winScore))
+
+        # Premier meilleur coup dans l'ordre de getValid, comme la recherche sans tri
+        i = int(np.argmax(scores))
+
+        return scores[i], moves[i]
+
+    def childCounts(self, state, moves):
+        """
+        Donne les cases par colonne et par ligne et le gagnant des positions
+        obtenues par moves (même résultat que make puis GameState.lineCounts et getWinner)
+
+        Entrées :
+            state [GameState] : état de la partie
+            moves [[(line, column, direction)]] : coups valides
+
+        Sorties :
+            [(([[int]], [[int]], [[int]], [[int]]), [int])] : colonnes et lignes du
+                joueur de la racine puis de l'autre joueur (une rangée par coup), et
+                numéro du joueur gagnant de chaque position (0 sans gagnant)
+        """
+
+        geometry = self.geometry
+        stride = geometry.stride
+        board = state.board
+        playerNumber = state.playerNumber
         otherPlayer = (playerNumber % 2)+1
 
-        # case du joueur par colonne
-        ccp = np.count_nonzero(board == playerNumber, axis=0)
-        ccpMax = np.amax(ccp)/NUMBER_CASE_TO_WIN
-
-        # case du joueur par ligne
-        clp = np.count_nonzero(board == playerNumber, axis=1)
-        clpMax = np.amax(clp)/NUMBER_CASE_TO_WIN
-
-        # case de l'autre joueur par colonne
-        cco = np.count_nonzero(board == otherPlayer, axis=0)
-        ccoMax = np.amax(cco)/NUMBER_CASE_TO_WIN
-
-        # case de l'autre joueur par ligne
-        clo = np.count_nonzero(board == otherPlayer, axis=1)
-        cloMax = np.amax(clo)/NUMBER_CASE_TO_WIN
-        diagonals = [np.diagonal(board, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                          (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de S-O vers N-E
-        flipBoard = np.flipud(board)
-        diagonals += [np.diagonal(flipBoard, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                               (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de N-O vers S-E
-        diagonals = np.array(diagonals)
-
-        cdp = np.count_nonzero(diagonals == playerNumber, axis=1)
-        cdpMax = np.amax(ccp)/NUMBER_CASE_TO_WIN
-        cdo = np.count_nonzero(diagonals == otherPlayer, axis=1)
-        cdoMax = np.amax(ccp)/NUMBER_CASE_TO_WIN
+        # counts[0] : colonnes, counts[1] : lignes, indexées par numéro de joueur - 1
+        state.lineCounts(playerNumber)
+        columns, rows = state.counts
+        counts = [np.repeat(np.array([columns[1], columns[2]])[:, np.newaxis], len(moves), axis=1),
+                  np.repeat(np.array([rows[1], rows[2]])[:, np.newaxis], len(moves), axis=1)]
+        winner = [0]*len(moves)
+
+        # Un pion posé ne peut faire gagner que le joueur qui le pose
+        wins = self.winningCells(state)
+        theirs = board.masks[otherPlayer]
+        cells, shifts, before, after = [], [], [], []
+        for i, (line, column, direction) in enumerate(moves):
+            if column != None:
+                bit = line*stride + column
+                cells.append((i, line, column, theirs >> bit & 1))
+                if wins >> bit & 1:
+                    winner[i] = playerNumber
+                continue
+
+            # Décalage : la ligne garde ses cases, chacune change de colonne. La
+            # position n'avait pas de gagnant : un alignement vient du décalage
+            shift = line*stride
+            rowMask = geometry.rowMask << shift
+            pieces = [board.masks[player] >> shift & geometry.rowMask for player in [1, 2]]
+            shifted = [row << 1 if direction == +1 else row >> 1 for row in pieces]
+            aligned = [player for player in [1, 2] if pieces[player-1] and
+                       hasLine((board.masks[player] & ~rowMask) | shifted[player-1] << shift, geometry)]
+
+            if len(aligned) == 2:
+                # Les deux joueurs alignés : l'ordre de parcours décide
+                token = state.make((line, column, direction))
+                aligned = [state.getWinner()[1]]
+                state.unmake(token)
+            winner[i] = aligned[0] if aligned else 0
+            shifts.append(i)
+            before.append(pieces)
+            after.append(shifted)
+
+        if cells:
+            i, lines, cols, taken = np.array(cells).T
+            counts[0][playerNumber-1, i, cols] += 1
+            counts[1][playerNumber-1, i, lines] += 1
+            taken = taken.astype(bool)
+            counts[0][otherPlayer-1, i[taken], cols[taken]] -= 1
+            counts[1][otherPlayer-1, i[taken], lines[taken]] -= 1
+        if shifts:
+            # Colonnes de chaque bit des lignes avant et après le décalage
+            columnBits = np.arange(geometry.width, dtype=np.uint64)
+            before = np.array(before, dtype=np.uint64)[..., np.newaxis] >> columnBits & 1
+            after = np.array(after, dtype=np.uint64)[..., np.newaxis] >> columnBits & 1
+            moved = after.astype(int) - before.astype(int)
+            counts[0][:, shifts] += np.transpose(moved, (1, 0, 2))
+
+        root, other = self.rootPlayer-1, self.rootPlayer % 2
+
+        return (counts[0][root], counts[1][root], counts[0][other], counts[1][other]), np.array(winner)
+
+    def tableMove(self, state):
+        """Donne le coup rangé dans la table de transposition pour state (ou None)"""
+
+        if self.table is None:
+            return None
+
+        entry = self.table.probe(state.positionHash() ^ self.rootKey)
+
+        return None if entry is None else entry[MOVE]
+
+    def orderMoves(self, state, moves, ttMove, ply, pvMove=None):
+        """
+        Trie les coups : coup de la variation principale, coup de la table,
+        victoires immédiates, blocages, coups meurtriers puis historique des coupures
+
+        Entrées :
+            state [GameState] : état de la partie
+            moves [[(line, column, direction)]] : coups valides
+            ttMove [(line, column, direction)] : coup de la table de transposition (ou None)
+            ply [int] : distance à la racine
+            pvMove [(line, column, direction)] : coup de la variation principale (ou None)
+
+        Sorties :
+            [[(line, column, direction)]] : coups triés
+        """
+
+        if not self.ordering:
+            return moves
+
+        geometry = self.geometry
+        board = state.board
+        mine = board.masks[state.playerNumber]
+        theirs = board.masks[(state.playerNumber % 2)+1]
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def priority(move):
+            if move == pvMove:
+                return 5*INFINITE
+            if move == ttMove:
+                return 4*INFINITE
+            line, column, direction = move
+            if column != None:
+                i = line*geometry.stride + column
+                bit = 1 << i
+                block = False
+                for segment in geometry.cellSegmentMasks[i]:
+                    if (mine | bit) & segment == segment:
+                        return 3*INFINITE
+                    if (theirs | bit) & segment == segment:
+                        block = True
+                if block:
+                    return 2*INFINITE
+            if move in killers:
+                return INFINITE
+            return history.get(move, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def addCutoff(self, move, depth, ply):
+        """
+        Retient un coup qui a provoqué une coupure
+
+        Entrées :
+            move [(line, column, direction)] : coup
+            depth [int] : profondeur restante
+            ply [int] : distance à la racine
+        """
+
+        self.cutoffs += 1
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+        self.history[move] = self.history.get(move, 0) + depth*depth
+
+    def heuristique_max(self, board, playerNumber, counts=None):
+        """
+        Evalue la probabilité que le player a de gagner sur cette board (ou sur
+        un tableau de boards, ou avec les cases par ligne counts de GameState.lineCounts
+        ou de childCounts)
+        """
+
+        toWin = self.geometry.toWin
+        if counts is None:
+            counts = self.countLines(board, playerNumber)
+        ccp, clp, cco, clo = counts
+        if isinstance(ccp, list):
+            amax = max
+        else:
+            amax = lambda counts: np.amax(counts, axis=-1)
+
+        ccpMax = amax(ccp)/toWin
+        clpMax = amax(clp)/toWin
+        ccoMax = amax(cco)/toWin
+        cloMax = amax(clo)/toWin
+
+        # Les termes des diagonales ont toujours repris les colonnes du joueur
+        cdpMax = ccpMax
+        cdoMax = ccpMax
 
         return 100*((ccpMax + clpMax + cdpMax)/3) - 80*((ccoMax + cloMax + cdoMax)/3)
 
-    def heuristique_mean(self, board, playerNumber):
-        """Evalue la probabilité que le player a de gagner sur cette board"""
+    def heuristique_mean(self, board, playerNumber, counts=None):
+        """
+        Evalue la probabilité que le player a de gagner sur cette board (ou sur
+        un tableau de boards, ou avec les cases par ligne counts de GameState.lineCounts
+        ou de childCounts)
+        """
 
-        otherPlayer = (playerNumber % 2)+1
+        toWin = self.geometry.toWin
+        if counts is None:
+            counts = self.countLines(board, playerNumber)
+        ccp, clp, cco, clo = counts
+        if isinstance(ccp, list):
+            mean = lambda counts: sum(counts)/len(counts)
+        else:
+            mean = lambda counts: np.sum(counts, axis=-1)/np.shape(counts)[-1]
+
+        ccpMean = mean(ccp)/toWin
+        clpMean = mean(clp)/toWin
+        ccoMean = mean(cco)/toWin
+        cloMean = mean(clo)/toWin
 
-        # case du joueur par colonne
-        ccp = np.count_nonzero(board == playerNumber, axis=0)
-        ccpMean = np.mean(ccp)/NUMBER_CASE_TO_WIN
-
-        # case du joueur par ligne
-        clp = np.count_nonzero(board == playerNumber, axis=1)
-        clpMean = np.mean(clp)/NUMBER_CASE_TO_WIN
-
-        # case de l'autre joueur par colonne
-        cco = np.count_nonzero(board == otherPlayer, axis=0)
-        ccoMean = np.mean(cco)/NUMBER_CASE_TO_WIN
-
-        # case de l'autre joueur par ligne
-        clo = np.count_nonzero(board == otherPlayer, axis=1)
-        cloMean = np.mean(clo)/NUMBER_CASE_TO_WIN
-        diagonals = [np.diagonal(board, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                          (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de S-O vers N-E
-        flipBoard = np.flipud(board)
-        diagonals += [np.diagonal(flipBoard, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                               (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de N-O vers S-E
-        diagonals = np.array(diagonals)
-
-        cdp = np.count_nonzero(diagonals == playerNumber, axis=1)
-        cdpMean = np.mean(ccp)/NUMBER_CASE_TO_WIN
-        cdo = np.count_nonzero(diagonals == otherPlayer, axis=1)
-        cdoMean = np.mean(ccp)/NUMBER_CASE_TO_WIN
+        # Les termes des diagonales ont toujours repris les colonnes du joueur
+        cdpMean = ccpMean
+        cdoMean = ccpMean
 
         return 100*((ccpMean + clpMean + cdpMean)/3) - 80*((ccoMean + cloMean + cdoMean)/3)
+
+    def heuristique_ntuple(self, board, playerNumber, counts=None, toMove=None):
+        """
+        Evalue la probabilité que le player a de gagner sur cette board (ou sur
+        un tableau de boards) quand toMove doit jouer (playerNumber si absent), avec
+        les tables n-uplet apprises (counts n'est pas utilisé)
+        """
+
+        return 100*self.network.evaluate(board, playerNumber, playerNumber if toMove is None else toMove)
+
+    def countLines(self, board, playerNumber):
+        """
+        Compte les cases de chaque joueur par colonne et par ligne
+
+        Entrées :
+            board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+                (ou tableau (n, lignes, colonnes) de plateaux)
+            playerNumber [int] : numéro du joueur
+
+        Sorties :
+            [([int], [int], [int], [int])] : colonnes et lignes du joueur, puis de l'autre joueur
+                (une rangée par plateau pour un tableau de plateaux)
+        """
+
+        geometry = self.geometry
+        otherPlayer = (playerNumber % 2)+1
+
+        # Lignes et colonnes du (des) plateau(x) en un produit matriciel par joueur
+        flat = np.reshape(board, np.shape(board)[:-2] + (-1,))
+        mine = (flat == playerNumber) @ geometry.lineMatrix
+        theirs = (flat == otherPlayer) @ geometry.lineMatrix
+
+        return (mine[..., geometry.columns], mine[..., geometry.rows],
+                theirs[..., geometry.columns], theirs[..., geometry.rows])
@@ -0,0 +1,34 @@
+import time
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class AIWorker(QThread):
+    # (coup, durée de la recherche en s, manche), émis depuis le fil de la recherche
+    played = pyqtSignal(object, float, int)
+
+    def __init__(self, ai, game):
+        """
+        Fil qui cherche le coup d'une ia sans bloquer l'interface
+
+        Entrées :
+            ai [AI] : ia qui doit jouer
+            game [int] : manche de la recherche (voir App.aiPlayed)
+        """
+
+        super().__init__()
+        self.ai = ai
+        self.game = game
+
+    def run(self):
+        """Cherche le coup puis le donne à l'interface par le signal played"""
+
+        startTime = time.monotonic()
+        move = self.ai.play()
+        self.played.emit(move, time.monotonic() - startTime, self.game)
+
+    def cancel(self):
+        """Interrompt la recherche et attend la fin du fil"""
+
+        self.ai.cancel()
+        self.wait()
@@ -1,15 +1,20 @@
 import copy
 import os
 import random
-import time
 import numpy as np
 
 from Config import *
+from Bitboard import successors
+from Geometry import getGeometry
+from Zobrist import hashBoard, hashCoup
 from Record import Record
+from StatsLog import StatsLog
 from AI import AI
+from Parallel import ParallelAI
+from GameState import GameState
 
 
-def valid_input_case(board, currentPlayerNumber, last_play, prev_boards, line, column):
+def valid_input_case(board, currentPlayerNumber, last_play, history, line, column, boardHash=None, geometry=None):
     """
     Vérifie si les données sont correctes selon les règles du jeu pour les cases
 
@@ -17,9 +22,11 @@ def valid_input_case(board, currentPlayerNumber, last_play, prev_boards, line, c
         board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
         currentPlayerNumber [int] : numéro du joueur actuel
         last_play [{"line", "column", "direction"}] : dernier coup joué
-        prev_boards [[board]] : liste des board précedement jouée
+        history [History] : positions précédement jouées (Record.getHistory)
         line [int] : coordonnée de la ligne
         column [int] : coordonnée de la colonne
+        boardHash [int] : hash de Zobrist du plateau (calculé si absent)
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
 
     Sorties :
         [bool] : données valides
@@ -40,32 +47,23 @@ def valid_input_case(board, currentPlayerNumber, last_play, prev_boards, line, c
 
             if valid_last_play or (last_play["line"] == None and last_play["column"] == None):
 
-                nSize, nLine, nColumn = np.shape(prev_boards)
+                if boardHash is None:
+                    boardHash = hashBoard(board, geometry)
 
-                valid = True
-                prev = 0
-                while valid and prev < nSize:
+                def nextBoard():
+                    newBoard = np.array(board, dtype=int)
+                    coup(newBoard, line=line, column=column,
+                         playerNumber=currentPlayerNumber)
+                    return newBoard.tobytes()
 
-                    prev_equal = True
-                    l = 0
-                    while prev_equal and l < nLine:
-                        c = 0
-                        while prev_equal and c < nColumn:
-                            if l == line and c == column:
-                                prev_equal = prev_boards[prev][l][c] == currentPlayerNumber
-                            else:
-                                prev_equal = board[l][c] == prev_boards[prev][l][c]
-                            c += 1
-                        l += 1
-
-                    valid = not prev_equal
-
-                    prev += 1
+                # Le plateau obtenu ne doit pas avoir déjà été joué
+                valid = not history.contains(hashCoup(
+                    boardHash, board, line=line, column=column, playerNumber=currentPlayerNumber, geometry=geometry), nextBoard)
 
     return valid
 
 
-def valid_input_shift(board, currentPlayerNumber, last_play, prev_boards, line, direction):
+def valid_input_shift(board, currentPlayerNumber, last_play, history, line, direction, boardHash=None, geometry=None):
     """
     Vérifie si les données sont correctes selon les règles du jeu pour les décallages
 
@@ -73,9 +71,11 @@ def valid_input_shift(board, currentPlayerNumber, last_play, prev_boards, line,
         board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
         currentPlayerNumber [int] : numéro du joueur actuel
         last_play [{"line", "column", "direction"}] : dernier coup joué
-        prev_boards [[board]] : liste des board précedement jouée
+        history [History] : positions précédement jouées (Record.getHistory)
         line [int] : coordonnée de la ligne
         direction [+1 ou -1] : direction du décalage
+        boardHash [int] : hash de Zobrist du plateau (calculé si absent)
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
 
     Sorties :
         [bool] : données valides
@@ -99,75 +99,173 @@ def valid_input_shift(board, currentPlayerNumber, last_play, prev_boards, line,
 
             if valid_last_play or (last_play["line"] == None and last_play["direction"] == None):
 
-                nSize, nLine, nColumn = np.shape(prev_boards)
+                if boardHash is None:
+                    boardHash = hashBoard(board, geometry)
 
-                valid = True
-                prev = 0
-                while valid and prev < nSize:
+                def nextBoard():
+                    newBoard = np.array(board, dtype=int)
+                    coup(newBoard, line=line, direction=direction)
+                    return newBoard.tobytes()
 
-                    prev_equal = True
-                    l = 0
-                    while prev_equal and l < nLine:
-                        c = 0
-                        while prev_equal and c < nColumn:
-                            if l == line:
-                                prev_equal = board[l][c] == prev_boards[prev][l][0 if c +
-                                                                                 direction == nColumn else c+direction]
-                            else:
-                                prev_equal = board[l][c] == prev_boards[prev][l][c]
-                            c += 1
-                        l += 1
+                # Le plateau obtenu ne doit pas avoir déjà été joué
+                valid = not history.contains(hashCoup(
+                    boardHash, board, line=line, direction=direction, geometry=geometry), nextBoard)
 
-                    valid = not prev_equal
+    return valid
 
-                    prev += 1
 
-    return valid
+def valid_moves(board, currentPlayerNumber, last_play, history, boardHash=None, boards=False, geometry=None):
+    """
+    Donne tous les coups valides en une seule passe sur des tableaux numpy
+    (même résultat que valid_input_case et valid_input_shift sur chaque coup)
+
+    Entrées :
+        board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        currentPlayerNumber [int] : numéro du joueur actuel
+        last_play [{"line", "column", "direction"}] : dernier coup joué
+        history [History] : positions précédement jouées (Record.getHistory)
+        boardHash [int] : hash de Zobrist du plateau (calculé si absent)
+        boards [bool] : donne aussi les plateaux obtenus
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
 
+    Sorties :
+        [[(line, column, direction)]] : coups valides
+        [[board]] : plateaux obtenus par chaque coup (si boards)
+    """
 
-def playerWin(board):
+    geometry = getGeometry() if geometry is None else geometry
+    table = geometry.zobrist
+    board = np.asarray(board)
+    nLine, nColumn = board.shape
+    if boardHash is None:
+        boardHash = hashBoard(board, geometry)
+    boardHash = np.uint64(boardHash)
+
+    # Cases : jouables, pas déjà au joueur et différentes du dernier coup
+    playable = (board != -1) & (board != currentPlayerNumber)
+    if last_play["line"] != None and last_play["column"] != None:
+        playable[last_play["line"], last_play["column"]] = False
+    caseLines, caseColumns = np.nonzero(playable)
+    hashes = [boardHash ^ table[board[caseLines, caseColumns]+1, caseLines, caseColumns]
+              ^ table[currentPlayerNumber+1, caseLines, caseColumns]]
+    moves = [(line, column, None)
+             for line, column in zip(caseLines.tolist(), caseColumns.tolist())]
+
+    # Décalages : bord libre et pas l'inverse du dernier coup. Le hash d'une
+    # ligne décalée s'obtient en lisant les clés de la colonne voisine.
+    columns = np.arange(nColumn)
+    columns = np.stack([columns, (columns+1) % nColumn, (columns-1) % nColumn])
+    lineHashes = np.bitwise_xor.reduce(table[board[np.newaxis]+1, np.arange(nLine)[np.newaxis, :, np.newaxis],
+                                             columns[:, np.newaxis, :]], axis=2)
+    for direction in [-1, +1]:
+        free = board[:, 0 if direction == -1 else -1] == -1
+        if last_play["line"] != None and last_play["direction"] == -direction:
+            free[last_play["line"]] = False
+        lines = np.nonzero(free)[0]
+
+        hashes.append(boardHash ^ lineHashes[0, lines] ^
+                      lineHashes[direction, lines])
+        moves += [(line, None, direction) for line in lines.tolist()]
+    hashes = np.concatenate(hashes)
+
+    if boards:
+        children = successors(board, moves, currentPlayerNumber)
+
+    def nextBoard(i):
+        if boards:
+            return children[i].tobytes()
+        newBoard = np.array(board, dtype=int)
+        line, column, direction = moves[i]
+        coup(newBoard, line=line, column=column,
+             playerNumber=currentPlayerNumber, direction=direction)
+        return newBoard.tobytes()
+
+    # Le plateau obtenu ne doit pas avoir déjà été joué (comparaison complète
+    # seulement pour les hash déjà connus)
+    valid = np.ones(len(moves), dtype=bool)
+    for i, h in enumerate(hashes.tolist()):
+        if h in history.positions:
+            valid[i] = not history.contains(h, lambda: nextBoard(i))
+
+    moves = [move for move, v in zip(moves, valid) if v]
+
+    return (moves, children[valid]) if boards else moves
+
+
+def playerWin(board, geometry=None):
     """
     Vérifie si un ou plusieurs joueur(s) à/ont gagné(s) la partie
 
     Entrées :
         board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
 
     Sorties :
         [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
     """
 
-    m_line = board
-    m_column = np.rot90(board)
-    m_diagonals = [np.diagonal(board, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                        (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de S-O vers N-E
-    flipBoard = np.flipud(board)
-    m_diagonals += [np.diagonal(flipBoard, i) for i in range((-BOARD_SIZE+1)+NUMBER_CASE_TO_WIN-1,
-                                                             (BOARD_SIZE+(BOARD_SIZE-1)*2)-NUMBER_CASE_TO_WIN+1)]  # Diagonnales de N-O vers S-E
-
-    for mat_elem in m_line:
-        draw, winner = checkWin(mat_elem)
-        if draw or winner != None:
-            return (draw, winner)
-
-    for mat_elem in m_column:
-        draw, winner = checkWin(mat_elem)
-        if draw or winner != None:
-            return (draw, winner)
-
-    for mat_elem in m_diagonals:
-        draw, winner = checkWin(mat_elem)
-        if draw or winner != None:
-            return (draw, winner)
+    geometry = getGeometry() if geometry is None else geometry
+    values = np.ravel(board)[geometry.segments]  # Tous les segments gagnants en une fois
+    win1 = np.all(values == 1, axis=1)
+    win2 = np.all(values == 2, axis=1)
+
+    if win1.any() and win2.any():
+        # Le résultat est celui de la première ligne parcourue qui contient un segment
+        first = geometry.segmentLine[win1 | win2].min()
+        return checkWin(geometry.flatten(board)[geometry.lineIndex[first]], geometry.toWin)
+    elif win1.any():
+        return (False, 1)
+    elif win2.any():
+        return (False, 2)
 
     return (False, None)
 
 
-def checkWin(mat_elem):
+def playerWinAt(board, last_play, geometry=None):
+    """
+    Vérifie si le dernier coup fait gagner un ou plusieurs joueur(s) en ne
+    regardant que les segments qui passent par les cases touchées. Le plateau
+    d'avant le coup ne doit pas avoir de gagnant (la partie serait finie).
+
+    Entrées :
+        board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        last_play [{"line", "column", "direction"}] : dernier coup joué
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
+    """
+
+    line, column = last_play["line"], last_play["column"]
+    if line == None:
+        return playerWin(board, geometry)
+
+    geometry = getGeometry() if geometry is None else geometry
+    flat = np.ravel(board)
+
+    if column != None:  # Case : seul le joueur qui a posé peut gagner
+        i = line*geometry.width + column
+        values = flat[geometry.segments[geometry.cellSegments[i]]]
+        return (False, int(flat[i]) if np.all(values == flat[i], axis=1).any() else None)
+
+    # Décalage : la ligne garde ses alignements, seuls les segments qui la traversent changent
+    values = flat[geometry.segments[geometry.rowSegments[line]]]
+    winners = [playerNumber for playerNumber in [1, 2]
+               if np.all(values == playerNumber, axis=1).any()]
+
+    if len(winners) > 1:  # Le résultat dépend de l'ordre de parcours de playerWin
+        return playerWin(board, geometry)
+
+    return (False, winners[0] if winners else None)
+
+
+def checkWin(mat_elem, toWin=NUMBER_CASE_TO_WIN):
     """
-    Vérifie si un nombre (NUMBER_CASE_TO_WIN) de case du même joueur sont aligné
+    Vérifie si un nombre (toWin) de case du même joueur sont aligné
 
     Entrées :
         mat_elem [[]] : listes
+        toWin [int] : nombre de cases alignées pour gagner
 
     Sorties :
         [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
@@ -179,7 +277,7 @@ def checkWin(mat_elem):
     n_find_1 = 0
     n_find_2 = 0
 
-    if len(mat_elem) >= NUMBER_CASE_TO_WIN:
+    if len(mat_elem) >= toWin:
 
         for j in mat_elem:
             if j == 1:
@@ -192,12 +290,12 @@ def checkWin(mat_elem):
             else:
                 n_find_2 = 0
 
-            if n_find_1 == NUMBER_CASE_TO_WIN:
+            if n_find_1 == toWin:
                 if res == 2:
                     draw = True
                 else:
                     res = 1
-            elif n_find_2 == NUMBER_CASE_TO_WIN:
+            elif n_find_2 == toWin:
                 if res == 1:
                     draw = True
                 else:
@@ -233,21 +331,28 @@ def coup(board, line=None, column=None, playerNumber=None, direction=None):
 
 
 class App():
-    def __init__(self, pyqt):
+    def __init__(self, pyqt, geometry=None):
         """
         Initialise les données de la partie
 
         Entrées :
             pyqt [pyqt] : class gérant le frontend
+            geometry [Geometry] : variante du plateau (celle de Config si absente)
         """
 
         self.pyqt = pyqt
+        self.geometry = getGeometry() if geometry is None else geometry
         self.record = Record(self)
 
         self.playerNames = ["", ""]
         self.score = [0, 0]
         self.playerMode = [1, 1]
         self.aiTimer = [0, 0]
+        self.ais = [None, None]  # Gardées d'un tour à l'autre (table de transposition, variation principale)
+        self.game = 0  # Numéro de la manche : les coups cherchés pour une manche finie sont ignorés
+
+        # Appelés avec les statistiques de chaque coup des ia (voir AI.moveStats)
+        self.statsHooks = [StatsLog(AI_STATS_LOG)] if AI_STATS_LOG else []
 
         self.firstGame = True
 
@@ -256,15 +361,23 @@ class App():
     def __init(self):
         """Définit les paramêtres d'une nouvelle manche"""
 
-        ml = [-1 for x in range(BOARD_SIZE-1)]
-        ca = [0 for l in range(BOARD_SIZE)]
-        mr = [-1 for x in range(BOARD_SIZE-1)]
-
-        self.board = np.array(
-            [ml + ca + mr for l in range(BOARD_SIZE)], dtype=int)
+        self.game += 1
+        # La recherche en cours est attendue : aucune autre (ni ponder) ne doit
+        # commencer sur la même ia tant qu'elle tourne
+        if self.pyqt is not None:
+            self.pyqt.cancelAi()
+        for ai in self.ais:
+            if ai is not None:
+                ai.stopPondering()
+                ai.cancel()
+
+        self.board = self.geometry.emptyBoard()
+        self.hash = hashBoard(self.board, self.geometry)
+        self.validCache = None
         self.started = False
         self.currentPlayerNumber = 2
         self.last_play = {"line": None, "column": None, "direction": None}
+        self.winner = (False, None)
 
         if not self.firstGame:
             self.record.newGame()
@@ -279,35 +392,23 @@ class App():
     def getValidCase(self):
         """Donne la liste des cases jouables"""
 
-        playable_coups = []
-
-        for l in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE+(BOARD_SIZE-1)*2):
-                if valid_input_case(self.board, self.currentPlayerNumber, self.last_play, self.record.getCurrentBoard()[:-1], l, c):
-                    playable_coups.append((l, c))
-
-        return playable_coups
+        return [(line, column) for line, column, direction in self.getValid() if column != None]
 
     def getValidShift(self, direction):
         """Donne la liste des décallages possibles"""
 
-        playable_coups = []
-
-        for l in range(BOARD_SIZE):
-            if valid_input_shift(self.board, self.currentPlayerNumber, self.last_play, self.record.getCurrentBoard()[:-1], l, direction):
-                playable_coups.append((l, direction))
-
-        return playable_coups
+        return [(line, d) for line, column, d in self.getValid() if d == direction]
 
     def getValid(self):
-        valid = [(line, column, None)
-                 for line, column in self.getValidCase()]
-        valid += [(line, None, direction)
-                  for line, direction in self.getValidShift(-1)]
-        valid += [(line, None, direction)
-                  for line, direction in self.getValidShift(+1)]
+        """Donne la liste des coups valides [(line, column, direction)]"""
 
-        return valid
+        key = (self.hash, self.currentPlayerNumber, self.last_play["line"], self.last_play["column"],
+               self.last_play["direction"], len(self.record.getCurrentBoard()))
+        if self.validCache is None or self.validCache[0] != key:
+            self.validCache = (key, valid_moves(self.board, self.currentPlayerNumber, self.last_play,
+                                                self.record.getHistory(), self.hash, geometry=self.geometry))
+
+        return self.validCache[1]
 
     def nextPlayer(self):
         """Met à jour le joueur actuel et le fait jouer si c'est une ia"""
@@ -321,39 +422,77 @@ class App():
 
             self.pyqt.initUI()
 
-            if self.started and self.playerMode[self.currentPlayerNumber-1] in [-1, -2, -3]:
+            if self.started and self.playerMode[self.currentPlayerNumber-1] in AI_MODES:
 
                 self.playerAi()
 
+            elif self.started and AI_PONDER and self.playerMode[self.currentPlayerNumber % 2] in AI_MODES:
+
+                # L'ia cherche pendant que le joueur réfléchit
+                self.getAi((self.currentPlayerNumber % 2)+1).ponder(self.getState())
+
     def playerAi(self):
-        """Joue un coup en tant qu'ia"""
+        """Fait chercher un coup à l'ia dans un autre fil (voir GUI.searchAi, le coup revient par aiPlayed)"""
+
+        self.pyqt.searchAi(self.getAi(), self.game)
 
-        startTime = time.time()
-        input_line, input_column, input_direction = AI(self).play()
-        endTime = time.time()
-        delta = endTime - startTime
+    def aiPlayed(self, move, delta, game):
+        """
+        Joue le coup trouvé par l'ia, ou la fait perdre si elle a dépassé AI_TIME
+
+        Entrées :
+            move [(line, column, direction)] : coup de l'ia
+            delta [float] : durée de la recherche (s)
+            game [int] : manche de la recherche (le coup est ignoré si une autre a commencé)
+        """
+
+        if game != self.game or not self.started:
+            return
+
+        stats = self.getAi().stats
+        if stats is not None:
+            for hook in self.statsHooks:
+                hook(stats)
+
+        input_line, input_column, input_direction = move
         if delta > AI_TIME:
             self.setScore((self.currentPlayerNumber % 2)+1)
             self.restart()
             self.setStarted(True)
             self.pyqt.initUI()
         else:
-            waitTime = self.aiTimer[self.currentPlayerNumber-1]
-            while delta < waitTime:
-                delta = time.time() - startTime
-
             if input_line != None and input_column != None:
                 self.setBoardCase(input_line, input_column)
             elif input_line != None and input_direction != None:
                 self.setBoardShift(input_line, input_direction)
 
-    def setCoup(self, board, line=None, column=None, playerNumber=None, direction=None):
-        """Joue un coup sur la board"""
+    def addStatsHook(self, hook):
+        """
+        Ajoute une fonction appelée après chaque coup des ia
+
+        Entrées :
+            hook [function] : fonction appelée avec les statistiques du coup (voir AI.moveStats)
+        """
 
-        pres = board[line][column] if line != None and column != None and playerNumber != None else None
-        coup(board, line=line, column=column,
-             playerNumber=playerNumber, direction=direction)
-        return (self.board, pres)
+        self.statsHooks.append(hook)
+
+    def getAi(self, playerNumber=None):
+        """
+        Donne l'ia du joueur, créée au premier coup puis gardée
+
+        Entrées :
+            playerNumber [int] : numéro du joueur (joueur actuel si absent)
+
+        Sorties :
+            [AI] : ia du joueur
+        """
+
+        playerNumber = self.currentPlayerNumber if playerNumber == None else playerNumber
+        if self.ais[playerNumber-1] is None:
+            self.ais[playerNumber-1] = AI(self) if AI_WORKERS == 1 else ParallelAI(self)
+        self.ais[playerNumber-1].mode = self.getPlayerMode(playerNumber)
+
+        return self.ais[playerNumber-1]
 
     def setBoardCase(self, line, column):
         """
@@ -365,10 +504,13 @@ class App():
             relative [bool] : True si les données sont sous la forme A1 ou 1+
         """
 
+        self.hash = hashCoup(self.hash, self.board, line=line, column=column,
+                             playerNumber=self.currentPlayerNumber, geometry=self.geometry)
         self.last_play = coup(
             self.board, line=line, column=column, playerNumber=self.currentPlayerNumber)
+        self.winner = playerWinAt(self.board, self.last_play, self.geometry)
 
-        self.record.addBoard(self.board)
+        self.record.addBoard(self.board, self.hash)
 
         self.nextPlayer()
 
@@ -383,12 +525,20 @@ class App():
         Sorties :
         """
 
+        self.hash = hashCoup(self.hash, self.board, line=line,
+                             direction=direction, geometry=self.geometry)
         self.last_play = coup(self.board, line=line, direction=direction)
+        self.winner = playerWinAt(self.board, self.last_play, self.geometry)
 
-        self.record.addBoard(copy.deepcopy(self.board))
+        self.record.addBoard(copy.deepcopy(self.board), self.hash)
 
         self.nextPlayer()
 
+    def getState(self):
+        """Donne une copie de l'état de la partie pour la recherche de l'ia"""
+
+        return GameState.fromApp(self)
+
     def getCurrentPlayer(self):
         """Donne le joueur actuel"""
 
@@ -439,7 +589,7 @@ class App():
     def getWinner(self, board=None):
         """Donne le gagnant(s) de la partie ou None"""
 
-        return playerWin(self.board if board is None else board)
+        return self.winner if board is None else playerWin(board, self.geometry)
 
     def getStarted(self):
         """Donne l'état de la partie"""
@@ -0,0 +1,756 @@
+import os
+import random
+import time
+import numpy as np
+
+from Config import *
+from Bitboard import Bitboard
+from GameState import GameState
+from Geometry import getGeometry
+from Zobrist import History, hashBoard
+from AI import AI
+from Book import Book
+from EvalStore import EvalStore
+from MCTS import MCTS
+from NTuple import NTuple
+from Parallel import ParallelAI
+import App
+
+
+def randomBoards(n, nMoves=12, seed=0, geometry=None):
+    """
+    Génère des plateaux en jouant des coups aléatoires
+
+    Entrées :
+        n [int] : nombre de plateaux
+        nMoves [int] : nombre de coups joués par plateau
+        seed [int] : graine du générateur
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [[Bitboard]] : plateaux générés
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    rand = random.Random(seed)
+    boards = []
+
+    for i in range(n):
+        board = Bitboard(geometry=geometry)
+        playerNumber = 1
+        for m in range(nMoves):
+            line = rand.randrange(geometry.size)
+            direction = rand.choice([-1, +1])
+            offset = board.offsets[line]
+            if rand.random() < 0.25 and 0 <= offset+direction <= geometry.maxOffset:
+                board.coup(line=line, direction=direction)
+            else:
+                column = offset + rand.randrange(geometry.size)
+                board.coup(line=line, column=column, playerNumber=playerNumber)
+            playerNumber = (playerNumber % 2)+1
+        boards.append(board)
+
+    return boards
+
+
+def randomGame(nMoves, seed=0, geometry=None):
+    """
+    Joue une partie aléatoire en respectant les règles
+
+    Entrées :
+        nMoves [int] : nombre maximal de coups
+        seed [int] : graine du générateur
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [(board, int, {"line", "column", "direction"}, History)] : position finale
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    rand = random.Random(seed)
+    board = geometry.emptyBoard()
+    history = History()
+    history.add(hashBoard(board, geometry), board.tobytes())
+    playerNumber = 1
+    last_play = {"line": None, "column": None, "direction": None}
+
+    for m in range(nMoves):
+        moves = App.valid_moves(board, playerNumber, last_play, history, geometry=geometry)
+        if not moves or App.playerWin(board, geometry) != (False, None):
+            break
+        line, column, direction = rand.choice(moves)
+        last_play = App.coup(board, line=line, column=column,
+                             playerNumber=playerNumber, direction=direction)
+        history.add(hashBoard(board, geometry), board.tobytes())
+        playerNumber = (playerNumber % 2)+1
+
+    return (board, playerNumber, last_play, history)
+
+
+def timeit(function, args, repeat=5):
+    """
+    Mesure le temps moyen d'un appel
+
+    Entrées :
+        function [function] : fonction à mesurer
+        args [[tuple]] : arguments de chaque appel
+        repeat [int] : nombre de passages sur args
+
+    Sorties :
+        [float] : temps moyen par appel (µs)
+    """
+
+    best = None
+    for r in range(repeat):
+        start = time.perf_counter()
+        for a in args:
+            function(*a)
+        delta = time.perf_counter() - start
+        best = delta if best is None else min(best, delta)
+
+    return best / len(args) * 1e6
+
+
+def report(name, before, after):
+    """Affiche une ligne du rapport"""
+
+    print('{:<24}{:>12.2f}{:>12.2f}{:>10.1f}x'.format(
+        name, before, after, before/after))
+
+
+def benchBitboard(n=2000):
+    """Compare coup / playerWin entre le tableau numpy et le Bitboard"""
+
+    boards = randomBoards(n)
+    arrays = [b.toArray() for b in boards]
+    rand = random.Random(1)
+    cases = [(rand.randrange(b.geometry.size), b.offsets[0]) for b in boards]
+
+    print('{:<24}{:>12}{:>12}{:>11}'.format('bitboard (µs/call)', 'numpy', 'bitboard', 'speedup'))
+
+    before = timeit(lambda a, l, c: App.coup(a, line=l, column=c, playerNumber=1),
+                    [(a, l, c) for a, (l, c) in zip(arrays, cases)])
+    after = timeit(lambda b, l, c: b.coup(line=l, column=c, playerNumber=1),
+                   [(b, l, c) for b, (l, c) in zip(boards, cases)])
+    report('coup (case)', before, after)
+
+    # Aller-retour pour garder des plateaux valides
+    shifts = [+1 if b.offsets[0] < b.geometry.maxOffset else -1 for b in boards]
+    before = timeit(lambda a, d: (App.coup(a, line=0, direction=d), App.coup(a, line=0, direction=-d)),
+                    list(zip(arrays, shifts)))
+    after = timeit(lambda b, d: (b.coup(line=0, direction=d), b.coup(line=0, direction=-d)),
+                   list(zip(boards, shifts)))
+    report('coup (shift x2)', before, after)
+
+    before = timeit(App.playerWin, [(a,) for a in arrays])
+    after = timeit(Bitboard.playerWin, [(b,) for b in boards])
+    report('playerWin', before, after)
+
+
+def benchValid(n=100):
+    """Compare la génération des coups case par case et en une passe"""
+
+    games = [randomGame(nMoves, seed=nMoves) for nMoves in range(5, 5+n)]
+    games = [game + (hashBoard(game[0]),) for game in games]
+
+    def perMove(board, playerNumber, last_play, history, h):
+        nLine, nColumn = board.shape
+        valid = [(l, c, None) for l in range(nLine) for c in range(nColumn)
+                 if App.valid_input_case(board, playerNumber, last_play, history, l, c, h)]
+        valid += [(l, None, d) for d in [-1, +1] for l in range(nLine)
+                  if App.valid_input_shift(board, playerNumber, last_play, history, l, d, h)]
+        return valid
+
+    print('{:<24}{:>12}{:>12}{:>11}'.format('getValid (µs/call)', 'per move', 'batch', 'speedup'))
+    before = timeit(perMove, games)
+    after = timeit(App.valid_moves, games)
+    report('getValid', before, after)
+
+
+def benchWin(n=200):
+    """Compare la vérification complète et incrémentale du gagnant"""
+
+    games = [randomGame(nMoves, seed=nMoves) for nMoves in range(1, 1+n)]
+    arrays = [(board, last_play) for board, playerNumber, last_play, history in games]
+    boards = [(Bitboard.fromArray(board), last_play) for board, last_play in arrays]
+
+    print('{:<24}{:>12}{:>12}{:>11}'.format('win check (µs/call)', 'full', 'last move', 'speedup'))
+    before = timeit(lambda board, last_play: App.playerWin(board), arrays)
+    after = timeit(App.playerWinAt, arrays)
+    report('numpy', before, after)
+    before = timeit(lambda board, last_play: board.playerWin(), boards)
+    after = timeit(Bitboard.playerWinAt, boards)
+    report('bitboard', before, after)
+
+
+def benchGeometry(variants=((4, 4), (5, 5), (6, 5)), n=20, nMoves=10):
+    """
+    Mesure l'évolution des coûts avec la taille du plateau
+
+    Entrées :
+        variants [[(int, int)]] : variantes (size, toWin) mesurées
+        n [int] : nombre de positions par variante
+        nMoves [int] : nombre de coups aléatoires avant chaque position
+    """
+
+    print('{:<24}{:>12}{:>12}{:>12}'.format('size / toWin', 'getValid', 'state', 'search (ms)'))
+
+    for size, toWin in variants:
+        geometry = getGeometry(size, toWin)
+        games = [randomGame(nMoves, seed=i, geometry=geometry) for i in range(n)]
+
+        valid = timeit(lambda board, playerNumber, last_play, history: App.valid_moves(
+            board, playerNumber, last_play, history, geometry=geometry), games)
+
+        states = []
+        for board, playerNumber, last_play, history in games:
+            stateHistory = History()
+            for keys in history.positions.values():
+                for key in keys:
+                    array = np.frombuffer(key, dtype=board.dtype).reshape(geometry.shape)
+                    b = Bitboard.fromArray(array, geometry)
+                    stateHistory.add(b.hash, b.key())
+            states.append((GameState(Bitboard.fromArray(board, geometry), playerNumber, last_play, stateHistory),))
+        state = timeit(GameState.getValid, states)
+
+        ai = AI(App.App(None, geometry), timeLimit=INFINITE)
+        ai.setMode(-1)
+        search = timeit(lambda s: ai.iterativeDeepening(s, maxDepth=2), states[:5], repeat=1) / 1000
+
+        print('{:<24}{:>12.2f}{:>12.2f}{:>12.2f}'.format('{} / {}'.format(size, toWin), valid, state, search))
+
+
+def randomStates(n, nMoves=10, geometry=None):
+    """
+    Génère des positions de parties aléatoires (sans leur historique)
+
+    Entrées :
+        n [int] : nombre de positions
+        nMoves [int] : nombre maximal de coups par partie
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [[GameState]] : positions générées
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    states = []
+    for i in range(n):
+        board, playerNumber, last_play, history = randomGame(nMoves, seed=i, geometry=geometry)
+        states.append(GameState(Bitboard.fromArray(board, geometry), playerNumber, last_play))
+
+    return states
+
+
+def searchAi(mode, tableEntries=TT_ENTRIES, ordering=True, geometry=None):
+    """Crée une ia de niveau mode sans limite de temps"""
+
+    ai = AI(App.App(None, geometry), timeLimit=INFINITE, tableEntries=tableEntries)
+    ai.setMode(mode)
+    ai.ordering = ordering
+
+    return ai
+
+
+def benchTable(n=5, depth=4):
+    """Compare la recherche sans et avec table de transposition pour chaque niveau d'ia"""
+
+    random.seed(0)
+    states = [(state,) for state in randomStates(n)]
+
+    print('{:<24}{:>12}{:>12}{:>11}{:>10}'.format('search (ms/call)', 'no table', 'table', 'speedup', 'hits'))
+
+    for mode in [-1, -2, -3]:
+        times = []
+        for tableEntries in [0, TT_ENTRIES]:
+            ai = searchAi(mode, tableEntries)
+            times.append(timeit(lambda state: ai.iterativeDeepening(
+                state.copy(), maxDepth=depth), states, repeat=1) / 1000)
+
+        print('{:<24}{:>12.2f}{:>12.2f}{:>10.1f}x{:>9.0f}%'.format(
+            'mode {} depth {}'.format(mode, depth), times[0], times[1], times[0]/times[1], 100*ai.table.hitRate()))
+
+
+def benchOrdering(n=5, depths=(3, 4, 5)):
+    """Compare le nombre de noeuds visités sans et avec tri des coups"""
+
+    random.seed(0)
+    states = randomStates(n)
+
+    print('{:<24}{:>12}{:>12}{:>11}'.format('nodes (per search)', 'unordered', 'ordered', 'ratio'))
+
+    for mode in [-1, -2]:
+        for depth in depths:
+            nodes = []
+            for ai in [searchAi(mode, 0, False), searchAi(mode)]:
+                total = 0
+                for state in states:
+                    ai.iterativeDeepening(state.copy(), maxDepth=depth)
+                    total += ai.nodes
+                nodes.append(total / len(states))
+
+            print('{:<24}{:>12.0f}{:>12.0f}{:>10.1f}x'.format(
+                'mode {} depth {}'.format(mode, depth), nodes[0], nodes[1], nodes[0]/nodes[1]))
+
+
+def benchBatch(n=5, depths=(3, 4)):
+    """
+    Compare l'évaluation des positions à un coup des feuilles une par une
+    (make, heuristique, unmake) et en une seule passe numpy, seule puis dans la recherche
+    """
+
+    random.seed(0)
+    states = randomStates(n)
+
+    print('{:<24}{:>12}{:>12}{:>11}'.format('frontier (ms)', 'one by one', 'batch', 'speedup'))
+
+    for mode in [-2, -3]:
+        ai = searchAi(mode)
+        ai.incremental = False
+        ai.rootPlayer = 1
+
+        def oneByOne(state, moves):
+            for move in moves:
+                token = state.make(move)
+                ai.evaluate(state)
+                state.unmake(token)
+
+        args = [(state, state.getValid()) for state in states]
+        times = [timeit(oneByOne, args), timeit(ai.evaluateChildren, args)]
+        report('mode {} children'.format(mode), times[0]/1000, times[1]/1000)
+
+        for depth in depths:
+            times = []
+            for batch in [False, True]:
+                ai = searchAi(mode)
+                ai.incremental = False
+                ai.batch = batch
+                start = time.perf_counter()
+                for state in states:
+                    ai.iterativeDeepening(state.copy(), maxDepth=depth)
+                times.append(1000*(time.perf_counter() - start)/n)
+            report('mode {} depth {}'.format(mode, depth), *times)
+
+
+def benchIncremental(n=6, depths=(4, 5), timeLimit=AI_TIME-AI_MARGIN):
+    """
+    Compare l'évaluation des feuilles : plateau recompté, frontière en une
+    passe numpy (benchBatch), cases par ligne tenues à jour par make / unmake,
+    et les deux à la fois (réglage par défaut)
+    """
+
+    random.seed(0)
+    states = randomStates(n, 12)
+    variants = [('recount', False, False), ('batch', True, False), ('incremental', False, True), ('both', True, True)]
+
+    print('{:<24}{:>12}{:>12}{:>12}{:>12}'.format('search (ms)', *[name for name, batch, incremental in variants]))
+
+    for mode in [-2, -3]:
+        for depth in depths:
+            times = []
+            for name, batch, incremental in variants:
+                start = time.perf_counter()
+                for i, state in enumerate(states):
+                    ai = searchAi(mode)
+                    ai.batch, ai.incremental = batch, incremental
+                    random.seed(i)  # Mêmes coups départagés au hasard pour chaque variante
+                    ai.iterativeDeepening(state.copy(), maxDepth=depth)
+                times.append(1000*(time.perf_counter() - start)/n)
+            print('{:<24}{:>12.1f}{:>12.1f}{:>12.1f}{:>12.1f}'.format('mode {} depth {}'.format(mode, depth), *times))
+
+        reached = []
+        for name, batch, incremental in variants:
+            total = 0
+            for i, state in enumerate(states):
+                ai = AI(App.App(None), timeLimit)
+                ai.setMode(mode)
+                ai.batch, ai.incremental = batch, incremental
+                random.seed(i)
+                ai.iterativeDeepening(state.copy())
+                total += ai.depth
+            reached.append(total/n)
+        print('{:<24}{:>12.2f}{:>12.2f}{:>12.2f}{:>12.2f}'.format('mode {} depth in {}s'.format(mode, timeLimit), *reached))
+
+
+def benchThreats(n=200, nMoves=16, maxDepth=6, quietDepth=5):
+    """
+    Compare la recherche sans et avec les menaces (AI.winningCells, AI.blockingMoves) :
+    temps pour prouver le résultat des positions tactiques (victoire en un coup
+    ou blocage forcé), puis temps à profondeur fixe sur les autres positions
+    """
+
+    random.seed(0)
+    tactical, quiet = [], []
+    for state in randomStates(n, nMoves):
+        if state.getWinner()[1] != None or not state.getValid():
+            continue
+        ai = searchAi(-2)
+        if ai.winningCells(state) or len(ai.blockingMoves(state, state.getValid())) < len(state.getValid()):
+            tactical.append(state)
+        elif len(quiet) < 12:
+            quiet.append(state)
+
+    # Un seul blocage forcé est joué sans chercher : c'est lui qui doit être rendu
+    forced = 0
+    for state in tactical:
+        ai = searchAi(-2)
+        blocks = ai.blockingMoves(state, state.getValid())
+        if len(blocks) == 1 and ai.winningMove(state, state.getValid()) is None:
+            assert ai.iterativeDeepening(state.copy(), maxDepth=maxDepth)[0] == blocks[0]
+            forced += 1
+    print('{} single forced blocks returned'.format(forced))
+
+    print('{:<24}{:>12}{:>12}{:>12}'.format('threats ({} tactical)'.format(len(tactical)), 'off', 'on', 'speedup'))
+
+    for mode in [-1, -2, -3]:
+        times, nodes = [], []
+        for threats in [False, True]:
+            total, count = 0, 0
+            for state in tactical:
+                ai = searchAi(mode)
+                ai.threats = threats
+                start = time.perf_counter()
+                # Approfondissement jusqu'au résultat prouvé (victoire ou défaite forcée)
+                ai.iterativeDeepening(state.copy(), maxDepth=maxDepth)
+                total += time.perf_counter() - start
+                count += ai.nodes
+            times.append(1e6*total/len(tactical))
+            nodes.append(count/len(tactical))
+        print('{:<24}{:>12.0f}{:>12.0f}{:>11.1f}x'.format('mode {} (us)'.format(mode), *times, times[0]/times[1]))
+        print('{:<24}{:>12.0f}{:>12.0f}'.format('mode {} (nodes)'.format(mode), *nodes))
+
+    wins = [state for state in tactical if searchAi(-2).winningMove(state, state.getValid())]
+    times = []
+    for threats in [False, True]:
+        total = 0
+        for state in wins:
+            ai = searchAi(-2)
+            ai.threats = threats
+            start = time.perf_counter()
+            ai.iterativeDeepening(state.copy(), maxDepth=maxDepth)
+            total += time.perf_counter() - start
+        times.append(1e6*total/len(wins))
+    print('{:<24}{:>12.0f}{:>12.0f}{:>11.1f}x'.format('win in one ({}, us)'.format(len(wins)), *times, times[0]/times[1]))
+
+    for mode in [-2, -3]:
+        times = []
+        for threats in [False, True]:
+            start = time.perf_counter()
+            for state in quiet:
+                ai = searchAi(mode)
+                ai.threats = threats
+                ai.iterativeDeepening(state.copy(), maxDepth=quietDepth)
+            times.append(1000*(time.perf_counter() - start)/len(quiet))
+        print('{:<24}{:>12.1f}{:>12.1f}{:>11.1f}x'.format('mode {} quiet (ms)'.format(mode), *times, times[0]/times[1]))
+
+
+def benchNTuple(n=20, depth=4, games=8, timeLimit=0.2, opponents=(-3, -2), maxMoves=60):
+    """
+    Mesure l'évaluation n-uplet (mode -5, tables de NTupleTrainer.py) : coût d'un
+    coup joué puis évalué et vitesse de recherche à profondeur fixe face à
+    heuristique_mean, puis parties à temps égal contre les autres niveaux (couleurs
+    alternées, deux premiers coups au hasard, nulle après maxMoves coups)
+    """
+
+    if NTuple.open(getGeometry()) is None:
+        print('ntuple : no weights, run NTupleTrainer.py first')
+        return
+
+    print('{:<24}{:>12}{:>12}'.format('ntuple', 'mode -3', 'mode -5'))
+
+    states = [state for state in randomStates(n, 12) if state.getWinner()[1] == None and state.getValid()]
+    leaf, knps = [], []
+    for mode in [-3, -5]:
+        ai = searchAi(mode)
+        ai.rootPlayer = 1
+        count = 0
+        start = time.perf_counter()
+        for state in states:
+            for move in state.getValid():
+                token = state.make(move)
+                ai.evaluate(state)
+                state.unmake(token)
+                count += 1
+        leaf.append(1e6*(time.perf_counter() - start)/count)
+
+        nodes = 0
+        start = time.perf_counter()
+        for state in states:
+            ai = searchAi(mode)
+            ai.iterativeDeepening(state.copy(), maxDepth=depth)
+            nodes += ai.nodes
+        knps.append(nodes/(time.perf_counter() - start)/1000)
+    print('{:<24}{:>12.1f}{:>12.1f}'.format('make + eval (us)', *leaf))
+    print('{:<24}{:>12.1f}{:>12.1f}'.format('depth {} (knps)'.format(depth), *knps))
+
+    print('{:<24}{:>12}{:>12}{:>12}'.format('ntuple vs ({:.1f} s)'.format(timeLimit), 'wins', 'draws', 'losses'))
+    for opponent in opponents:
+        results = [0, 0, 0]
+        for game in range(games):
+            random.seed(game)
+            app = App.App(None)
+            app.currentPlayerNumber = 1
+            ntuple = 1 + game % 2
+            ais = [AI(app, timeLimit), AI(app, timeLimit)]
+            for playerNumber, ai in enumerate(ais, 1):
+                ai.mode = -5 if playerNumber == ntuple else opponent
+                ai.book = False
+
+            winner = None
+            for m in range(maxMoves):
+                winner = app.getWinner()[1]
+                if winner != None:
+                    break
+                playerNumber = app.currentPlayerNumber
+                if m < 2:
+                    line, column, direction = random.choice(app.getState().getValid())
+                else:
+                    line, column, direction = ais[playerNumber-1].play()
+                if column != None:
+                    app.setBoardCase(line, column)
+                else:
+                    app.setBoardShift(line, direction)
+                app.currentPlayerNumber = (playerNumber % 2)+1
+            else:
+                winner = app.getWinner()[1]
+
+            results[0 if winner == ntuple else 2 if winner in [1, 2] else 1] += 1
+        print('{:<24}{:>12}{:>12}{:>12}'.format('mode {}'.format(opponent), *results))
+
+
+def benchSession(nMoves=16, timeLimit=0.2, modes=(-1, -2, -3)):
+    """
+    Compare la profondeur atteinte dans une partie ia contre ia entre une ia
+    recréée à chaque coup (alpha-bêta simple) et une ia gardée d'un tour à l'autre
+    (variation principale, fenêtres d'aspiration), sur les mêmes positions
+    """
+
+    print('{:<24}{:>12}{:>12}'.format('depth (mean)', 'fresh', 'persistent'))
+
+    for mode in modes:
+        random.seed(0)
+        app = App.App(None)
+        app.currentPlayerNumber = 1
+        ais = [AI(app, timeLimit), AI(app, timeLimit)]
+        for ai in ais:
+            ai.book = False  # Les coups du livre n'ont pas de profondeur atteinte
+        fresh = []
+        persistent = []
+
+        for m in range(nMoves):
+            if app.getWinner() != (False, None):
+                break
+            playerNumber = app.currentPlayerNumber
+
+            ai = AI(app, timeLimit)
+            ai.pvs = ai.aspiration = ai.book = False
+            ai.mode = mode
+            ai.play()
+            fresh.append(ai.depth)
+
+            ai = ais[playerNumber-1]
+            ai.mode = mode
+            line, column, direction = ai.play()
+            persistent.append(ai.depth)
+
+            if column != None:
+                app.setBoardCase(line, column)
+            else:
+                app.setBoardShift(line, direction)
+            app.currentPlayerNumber = (playerNumber % 2)+1
+
+        print('{:<24}{:>12.2f}{:>12.2f}'.format(
+            'mode {}'.format(mode), sum(fresh)/len(fresh), sum(persistent)/len(persistent)))
+
+
+def benchMcts(timeLimit=0.5, variants=((4, 4), (5, 5), (6, 5))):
+    """Mesure le nombre de simulations Monte-Carlo par seconde selon la variante"""
+
+    print('{:<24}{:>12}'.format('mcts', 'playouts/s'))
+
+    for size, toWin in variants:
+        geometry = getGeometry(size, toWin)
+        random.seed(0)
+        mcts = MCTS(timeLimit)
+        mcts.search(GameState(geometry=geometry))
+
+        print('{:<24}{:>12.0f}'.format('{} / {}'.format(size, toWin), mcts.done/timeLimit))
+
+
+def benchParallel(workers=0, timeLimit=0.5, n=3):
+    """Compare les noeuds visités en timeLimit par une ia et par une ia répartie sur plusieurs processus"""
+
+    random.seed(0)
+    states = randomStates(n, 12)
+    app = App.App(None)
+    parallel = ParallelAI(app, workers, timeLimit)
+    time.sleep(2)  # Démarrage des processus
+
+    print('{:<24}{:>12}{:>12}  per worker'.format('nodes ({} workers)'.format(parallel.workers), '1 process', 'parallel'))
+
+    for mode in [-1, -2, -4]:
+        single = AI(app, timeLimit)
+        single.setMode(mode)
+        parallel.setMode(mode)
+        nodes = [0, 0]
+        workerNodes = {}
+        for state in states:
+            if mode == -4:
+                single.mcts = MCTS(timeLimit)
+                single.mcts.search(state.copy())
+                nodes[0] += single.mcts.done
+                parallel.searchTrees(state.copy())
+            else:
+                single.iterativeDeepening(state.copy())
+                nodes[0] += single.nodes
+                parallel.searchRoot(state.copy())
+            nodes[1] += parallel.nodes
+            for i, count in enumerate(sorted(parallel.workerNodes.values(), reverse=True)):
+                workerNodes[i] = workerNodes.get(i, 0) + count
+
+        print('{:<24}{:>12.0f}{:>12.0f}  {}'.format('mode {}'.format(mode), nodes[0]/n, nodes[1]/n,
+                                                   ' '.join('{:.0f}'.format(c/n) for c in workerNodes.values())))
+
+
+def benchSharedTable(workers=0, timeLimit=0.5, n=3):
+    """Compare les processus de recherche avec une table de transposition partagée ou une table chacun"""
+
+    random.seed(0)
+    states = randomStates(n, 12)
+    app = App.App(None)
+    ais = {'private': ParallelAI(app, workers, timeLimit, shared=False),
+           'shared': ParallelAI(app, workers, timeLimit, shared=True)}
+    time.sleep(2)  # Démarrage des processus
+
+    print('{:<24}{:>12}{:>12}{:>12}'.format('table ({} workers)'.format(ais['shared'].workers),
+                                            'nodes/s', 'depth', 'filled'))
+
+    for mode in [-1, -2]:
+        for name, ai in ais.items():
+            ai.setMode(mode)
+            nodes = depth = 0
+            for state in states:
+                ai.searchRoot(state.copy())
+                nodes += ai.nodes
+                depth += ai.depth
+            # Part de la table partagée remplie par les recherches de tous les processus
+            rate = '{:>12.2f}'.format(len(ai.table) / (2*ai.table.buckets)) if ai.shared else ''
+            print('{:<24}{:>12.0f}{:>12.1f}{}'.format('mode {} {}'.format(mode, name),
+                                                     nodes/(n*timeLimit), depth/n, rate))
+
+
+def benchBook(timeLimit=0.5, modes=(-1, -2, -3)):
+    """Compare le temps d'un coup du livre d'ouvertures et d'une recherche, après chaque premier coup"""
+
+    geometry = getGeometry()
+    print('{:<24}{:>12}{:>12}{:>12}'.format('opening (ms)', 'positions', 'book', 'search'))
+
+    for mode in modes:
+        book = Book.open(geometry, mode)
+        if book is None:
+            print('{:<24}  no book, run BookBuilder.py'.format('mode {}'.format(mode)))
+            continue
+
+        ai = AI(None, timeLimit, geometry=geometry)
+        ai.setMode(mode)
+        state = GameState(geometry=geometry)
+        times = [0, 0]
+        moves = state.getValid()
+        for move in moves:
+            token = state.make(move)
+            start = time.perf_counter()
+            ai.bookMove(state)
+            times[0] += time.perf_counter() - start
+            start = time.perf_counter()
+            ai.iterativeDeepening(state.copy(), BOOK_DEPTH)
+            times[1] += time.perf_counter() - start
+            state.unmake(token)
+
+        print('{:<24}{:>12}{:>12.3f}{:>12.1f}'.format('mode {}'.format(mode), len(book),
+                                                     1000*times[0]/len(moves), 1000*times[1]/len(moves)))
+
+
+def benchStore(n=2000, rows=1000, path='./cache/benchmark.sqlite'):
+    """Mesure la base des résultats de recherche : rangement, recherche et suppression des moins utilisés"""
+
+    random.seed(0)
+    states = randomStates(n, 10)
+    store = EvalStore(path, rows)
+    store.db.execute('DELETE FROM positions')
+    store.count = 0
+
+    t = timeit(store.store, [(state, -2, 4, state.getValid()[0], 0.0) for state in states], 1)
+    print('{:<24}{:>12.1f} us  ({} rows kept of {})'.format('store', t, len(store), n))
+    t = timeit(store.lookup, [(state, -2) for state in states], 1)
+    print('{:<24}{:>12.1f} us  ({} hits)'.format('lookup', t, store.hits))
+
+    store.close()
+    os.remove(path)
+
+
+def benchPonder(nMoves=12, timeLimit=0.5, think=1.0, modes=(-2, -3)):
+    """
+    Compare le temps de réponse et la profondeur d'une ia sans et avec ponder
+    contre un joueur qui réfléchit think secondes (ses coups sont ceux d'une ia
+    calculés avant son tour de réflexion, pour ne pas prendre de temps de calcul à ponder)
+    """
+
+    print('{:<24}{:>12}{:>12}{:>12}{:>12}'.format('ponder', 'latency', 'depth', 'hits', 'misses'))
+
+    for mode in modes:
+        for ponder in [False, True]:
+            random.seed(0)
+            app = App.App(None)
+            app.currentPlayerNumber = 1
+            ai = AI(app, timeLimit)
+            ai.mode = mode
+            player = AI(app, timeLimit)
+            player.mode = -2
+            ai.book = player.book = False
+            latency = []
+            depths = []
+
+            for m in range(nMoves):
+                if app.getWinner() != (False, None):
+                    break
+                playerNumber = app.currentPlayerNumber
+                if playerNumber == 1:
+                    start = time.monotonic()
+                    line, column, direction = ai.play()
+                    latency.append(time.monotonic() - start)
+                    depths.append(ai.depth)
+                else:
+                    line, column, direction = player.play()
+                    if ponder:
+                        ai.ponder(app.getState())
+                    time.sleep(think)
+
+                if column != None:
+                    app.setBoardCase(line, column)
+                else:
+                    app.setBoardShift(line, direction)
+                app.currentPlayerNumber = (playerNumber % 2)+1
+
+            print('{:<24}{:>12.3f}{:>12.2f}{:>12}{:>12}'.format(
+                'mode {} {}'.format(mode, 'on' if ponder else 'off'), sum(latency)/len(latency),
+                sum(depths)/len(depths), ai.ponderHits, ai.ponderMisses))
+
+
+if __name__ == '__main__':
+    benchBitboard()
+    benchValid()
+    benchWin()
+    benchGeometry()
+    benchTable()
+    benchOrdering()
+    benchBatch()
+    benchIncremental()
+    benchThreats()
+    benchNTuple()
+    benchSession()
+    benchPonder()
+    benchMcts()
+    benchParallel()
+    benchSharedTable()
+    benchBook()
+    benchStore()
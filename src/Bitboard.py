@@ -0,0 +1,460 @@
+import numpy as np
+
+from Geometry import getGeometry
+
+
+# Le plateau est stocké en coordonnées absolues (les mêmes que le tableau
+# numpy de App) : la case (line, column) correspond au bit line*stride+column.
+# Une colonne de garde (toujours vide) sépare les lignes pour que les décalages
+# de bits ne passent jamais d'une ligne à l'autre (voir Geometry).
+
+
+def hasLine(mask, geometry):
+    """
+    Vérifie si un masque contient geometry.toWin bits alignés
+
+    Entrées :
+        mask [int] : cases d'un joueur
+        geometry [Geometry] : variante du plateau
+
+    Sorties :
+        [bool] : alignement trouvé
+    """
+
+    for d in geometry.directions:
+        m = mask
+        for k in range(1, geometry.toWin):
+            m &= mask >> (k*d)
+            if not m:
+                break
+        if m:
+            return True
+
+    return False
+
+
+def threats(mask, free, geometry):
+    """
+    Cherche en une passe (décalages de bits, comme hasLine) les segments
+    auxquels il ne manque qu'une case au joueur
+
+    Entrées :
+        mask [int] : cases du joueur
+        free [int] : cases où il peut poser un pion
+        geometry [Geometry] : variante du plateau
+
+    Sorties :
+        [(int, int, int)] : (cases qui complètent un segment, cases communes à
+            tous ces segments, lignes traversées par tous ces segments et pas
+            seulement parcourues (-1 sans segment))
+    """
+
+    stride = geometry.stride
+    cells, common, lines = 0, -1, -1
+    for step, shifts, across in geometry.segmentSteps:
+        shifted = [mask >> s for s in shifts]
+
+        # suffix[j] : débuts des segments dont les cases après j sont au joueur
+        suffix = shifted[:]
+        following = -1
+        for k in range(len(shifts)-1, -1, -1):
+            suffix[k] = following
+            following &= shifted[k]
+
+        prefix = -1  # Débuts des segments dont les cases avant j sont au joueur
+        for j, s in enumerate(shifts):
+            starts = prefix & suffix[j]
+            if starts:
+                starts &= free >> s
+                while starts:
+                    bit = starts & -starts
+                    cells |= bit << s
+                    common &= bit*step
+                    lines &= across << ((bit.bit_length()-1) // stride)
+                    starts ^= bit
+            prefix &= shifted[j]
+            if not prefix:
+                break
+
+    return cells, common, lines
+
+
+def successors(board, moves, playerNumber):
+    """
+    Construit en une fois les plateaux obtenus par chaque coup
+
+    Entrées :
+        board [[int,int,...],[int,int,...],...] : tableau de App
+        moves [[(line, column, direction)]] : coups
+        playerNumber [int] : numéro du joueur qui joue
+
+    Sorties :
+        [[board]] : tableau (len(moves), lignes, colonnes) des plateaux obtenus
+    """
+
+    board = np.asarray(board)
+    boards = np.repeat(board[np.newaxis], len(moves), axis=0)
+
+    cells = [(i, line, column) for i, (line, column, direction) in enumerate(moves) if column != None]
+    if cells:
+        i, lines, columns = np.array(cells).T
+        boards[i, lines, columns] = playerNumber
+
+    shifts = [(i, line, direction) for i, (line, column, direction) in enumerate(moves) if column == None]
+    if shifts:
+        i, lines, directions = np.array(shifts).T
+        # np.roll(ligne, direction)[c] = ligne[c - direction]
+        columns = (np.arange(board.shape[1])[np.newaxis, :] - directions[:, np.newaxis]) % board.shape[1]
+        boards[i, lines] = board[lines[:, np.newaxis], columns]
+
+    return boards
+
+
+def winners(boards, geometry):
+    """
+    Donne le gagnant de plusieurs plateaux à la fois (même résultat que App.playerWin)
+
+    Entrées :
+        boards [[board]] : tableau (n, lignes, colonnes) de plateaux
+        geometry [Geometry] : variante du plateau
+
+    Sorties :
+        [[int]] : numéro du joueur gagnant de chaque plateau (0 sans gagnant)
+    """
+
+    flat = boards.reshape(len(boards), -1)
+    win1 = (flat == 1) @ geometry.segmentMatrix == geometry.toWin
+    win2 = (flat == 2) @ geometry.segmentMatrix == geometry.toWin
+
+    # Si les deux joueurs gagnent, le premier segment dans l'ordre de parcours
+    # de App.playerWin décide
+    complete = win1 | win2
+    first = np.argmax(complete, axis=1)
+    found = complete[np.arange(len(boards)), first]
+
+    return np.where(found, np.where(win1[np.arange(len(boards)), first], 1, 2), 0)
+
+
+class Bitboard():
+    def __init__(self, masks=None, offsets=None, h=None, geometry=None):
+        """
+        Initialise un plateau compact
+
+        Entrées :
+            masks [[int,int,int]] : cases de chaque joueur (l'indice 0 n'est pas utilisé)
+            offsets [[int,int,...]] : colonne de la première case de chaque ligne
+            h [int] : hash de Zobrist du plateau (calculé si absent)
+            geometry [Geometry] : variante du plateau (celle de Config si absente)
+        """
+
+        self.geometry = getGeometry() if geometry is None else geometry
+        self.masks = [0, 0, 0] if masks is None else list(masks)
+        self.offsets = [self.geometry.size-1 for l in range(self.geometry.size)] if offsets is None else list(offsets)
+        self.cells = self.computeCells()  # Cases du plateau (hors bords), tenues à jour par coup
+        self.hash = self.computeHash() if h is None else h
+
+    @classmethod
+    def fromArray(cls, board, geometry=None):
+        """
+        Construit le plateau compact depuis le tableau de App
+
+        Entrées :
+            board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+            geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+        Sorties :
+            [Bitboard] : plateau compact
+        """
+
+        geometry = getGeometry() if geometry is None else geometry
+        board = np.asarray(board)
+        masks = [0, 0, 0]
+        for playerNumber in [1, 2]:
+            for line, column in zip(*np.nonzero(board == playerNumber)):
+                masks[playerNumber] |= 1 << (int(line)*geometry.stride + int(column))
+
+        offsets = [int(np.argmax(row != -1)) for row in board]
+
+        return cls(masks, offsets, geometry=geometry)
+
+    def toArray(self):
+        """
+        Construit le tableau de App depuis le plateau compact
+
+        Sorties :
+            [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        """
+
+        size, stride = self.geometry.size, self.geometry.stride
+        board = np.full(self.geometry.shape, -1, dtype=int)
+        for line, offset in enumerate(self.offsets):
+            board[line][offset:offset+size] = 0
+
+        for playerNumber in [1, 2]:
+            mask = self.masks[playerNumber]
+            while mask:
+                bit = mask & -mask
+                line, column = divmod(bit.bit_length()-1, stride)
+                board[line][column] = playerNumber
+                mask ^= bit
+
+        return board
+
+    def copy(self):
+        """Donne une copie du plateau"""
+
+        return Bitboard(self.masks, self.offsets, self.hash, self.geometry)
+
+    def computeCells(self):
+        """Calcule le masque des cases du plateau (hors bords)"""
+
+        stride, lineCells = self.geometry.stride, self.geometry.lineCells
+        cells = 0
+        for line, offset in enumerate(self.offsets):
+            cells |= lineCells << (line*stride + offset)
+
+        return cells
+
+    def computeHash(self):
+        """Calcule le hash de Zobrist du plateau (identique à Zobrist.hashBoard)"""
+
+        keys, stride = self.geometry.zobristKeys, self.geometry.stride
+        h = 0
+        for line, offset in enumerate(self.offsets):
+            h ^= self.geometry.zobristPadding[line][offset]
+
+        for playerNumber in [1, 2]:
+            mask = self.masks[playerNumber]
+            while mask:
+                bit = mask & -mask
+                line, column = divmod(bit.bit_length()-1, stride)
+                h ^= keys[playerNumber+1][line][column]
+                mask ^= bit
+
+        return h
+
+    def key(self):
+        """Donne une clé identifiant le plateau"""
+
+        return (self.masks[1], self.masks[2], tuple(self.offsets))
+
+    def __eq__(self, other):
+        return isinstance(other, Bitboard) and self.key() == other.key()
+
+    def getCell(self, line, column):
+        """
+        Donne le contenu d'une case
+
+        Entrées :
+            line [int] : coordonnée de la ligne
+            column [int] : coordonnée de la colonne
+
+        Sorties :
+            [int] : -1 hors plateau, 0 vide, sinon numéro du joueur
+        """
+
+        offset = self.offsets[line]
+        if not offset <= column < offset+self.geometry.size:
+            return -1
+
+        bit = 1 << (line*self.geometry.stride + column)
+        if self.masks[1] & bit:
+            return 1
+        elif self.masks[2] & bit:
+            return 2
+
+        return 0
+
+    def coup(self, line=None, column=None, playerNumber=None, direction=None):
+        """
+        Joue le coup sur le plateau (même comportement que App.coup)
+
+        Entrées :
+            line [int] : coordonnée de la ligne
+            column [int] : coordonnée de la colonne
+            playerNumber [int] : numéro du joueur
+            direction [+1 ou -1] : direction du décalage
+
+        Sorties :
+            [{"line", "column", "direction"}] : coup joué
+        """
+
+        geometry = self.geometry
+        keys = geometry.zobristKeys
+
+        if line != None and column != None and playerNumber != None:  # Coordonnées case
+
+            bit = 1 << (line*geometry.stride + column)
+            masks = self.masks
+            old = 1 if masks[1] & bit else 2 if masks[2] & bit else 0
+            self.hash ^= keys[old+1][line][column] ^ keys[playerNumber+1][line][column]
+            masks[1] &= ~bit
+            masks[2] &= ~bit
+            if playerNumber:
+                masks[playerNumber] |= bit
+
+        elif line != None and direction != None:  # Décalage
+
+            shift = line*geometry.stride
+            rowMask = geometry.rowMask << shift
+            offset = self.offsets[line]
+            padding = geometry.zobristPadding[line]
+            h = self.hash ^ padding[offset] ^ padding[offset+direction]
+            for playerNumber in [1, 2]:
+                mask = self.masks[playerNumber]
+                row = mask & rowMask
+
+                rowKeys = keys[playerNumber+1][line]
+                pieces = row >> shift
+                while pieces:
+                    bit = pieces & -pieces
+                    c = bit.bit_length()-1
+                    h ^= rowKeys[c] ^ rowKeys[c+direction]
+                    pieces ^= bit
+
+                row = row << 1 if direction == +1 else row >> 1
+                self.masks[playerNumber] = (mask & ~rowMask) | (row & rowMask)
+            self.offsets[line] += direction
+            # La ligne perd une case à un bout et en gagne une à l'autre
+            self.cells ^= (1 | 1 << geometry.size) << (shift + min(offset, offset+direction))
+            self.hash = h
+
+        return {"line": line, "column": column, "direction": direction}
+
+    def hashAfter(self, line=None, column=None, playerNumber=None, direction=None):
+        """
+        Donne le hash du plateau après un coup, sans jouer le coup
+
+        Entrées :
+            line [int] : coordonnée de la ligne
+            column [int] : coordonnée de la colonne
+            playerNumber [int] : numéro du joueur
+            direction [+1 ou -1] : direction du décalage
+
+        Sorties :
+            [int] : hash du plateau après le coup
+        """
+
+        geometry = self.geometry
+        keys = geometry.zobristKeys
+
+        if column != None:  # Coordonnées case
+            return self.hash ^ keys[self.getCell(line, column)+1][line][column] ^ keys[playerNumber+1][line][column]
+
+        # Décalage
+        shift = line*geometry.stride
+        offset = self.offsets[line]
+        padding = geometry.zobristPadding[line]
+        h = self.hash ^ padding[offset] ^ padding[offset+direction]
+        for playerNumber in [1, 2]:
+            rowKeys = keys[playerNumber+1][line]
+            pieces = (self.masks[playerNumber] >> shift) & geometry.rowMask
+            while pieces:
+                bit = pieces & -pieces
+                column = bit.bit_length()-1
+                h ^= rowKeys[column] ^ rowKeys[column+direction]
+                pieces ^= bit
+
+        return h
+
+    def playerWin(self):
+        """
+        Vérifie si un ou plusieurs joueur(s) à/ont gagné(s) la partie
+
+        Sorties :
+            [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
+        """
+
+        win1 = hasLine(self.masks[1], self.geometry)
+        win2 = hasLine(self.masks[2], self.geometry)
+
+        if win1 and win2:
+            return self.scanLines()
+        elif win1:
+            return (False, 1)
+        elif win2:
+            return (False, 2)
+
+        return (False, None)
+
+    def playerWinAt(self, last_play):
+        """
+        Vérifie si le dernier coup fait gagner un ou plusieurs joueur(s) en ne
+        regardant que les segments qui passent par les cases touchées (même
+        résultat que playerWin si le plateau précédent n'avait pas de gagnant)
+
+        Entrées :
+            last_play [{"line", "column", "direction"}] : dernier coup joué
+
+        Sorties :
+            [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
+        """
+
+        line, column = last_play["line"], last_play["column"]
+        if line == None:
+            return self.playerWin()
+
+        if column != None:  # Case : seul le joueur qui a posé peut gagner
+            i = line*self.geometry.stride + column
+            playerNumber = 1 if self.masks[1] >> i & 1 else 2
+            mask = self.masks[playerNumber]
+            for segment in self.geometry.cellSegmentMasks[i]:
+                if mask & segment == segment:
+                    return (False, playerNumber)
+
+            return (False, None)
+
+        # Décalage : la ligne garde ses alignements, seuls les segments qui
+        # la traversent changent, pour chaque joueur qui a un pion dessus
+        rowMask = self.geometry.rowMask << (line*self.geometry.stride)
+        winners = []
+        for playerNumber in [1, 2]:
+            mask = self.masks[playerNumber]
+            if mask & rowMask:
+                for segment in self.geometry.rowSegmentMasks[line]:
+                    if mask & segment == segment:
+                        winners.append(playerNumber)
+                        break
+
+        if len(winners) == 2:
+            return self.scanLines()
+
+        return (False, winners[0] if winners else None)
+
+    def scanLines(self):
+        """
+        Parcourt les lignes dans l'ordre de App.playerWin (utile quand les deux
+        joueurs sont alignés, le résultat dépend alors de la première ligne trouvée)
+
+        Sorties :
+            [(bool, int)] : (égalité, numéro du joueur gagnant (ou None))
+        """
+
+        mask1, mask2 = self.masks[1], self.masks[2]
+        toWin = self.geometry.toWin
+
+        for line in self.geometry.lineBits:
+            res = None
+            draw = False
+            n_find_1 = 0
+            n_find_2 = 0
+
+            for i in line:
+                n_find_1 = n_find_1+1 if mask1 >> i & 1 else 0
+                n_find_2 = n_find_2+1 if mask2 >> i & 1 else 0
+
+                if n_find_1 == toWin:
+                    if res == 2:
+                        draw = True
+                    else:
+                        res = 1
+                elif n_find_2 == toWin:
+                    if res == 1:
+                        draw = True
+                    else:
+                        res = 2
+
+            if draw or res != None:
+                return (draw, res)
+
+        return (False, None)
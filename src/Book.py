@@ -0,0 +1,92 @@
+import os
+import numpy as np
+
+from Config import *
+from GameState import GameState
+from Symmetry import canonical, transformBoard, transformMove
+from TranspositionTable import unpackMove
+
+
+# Livres déjà ouverts, par fichier
+BOOKS = {}
+
+
+def bookHash(state):
+    """
+    Donne le hash de la position canonique (voir Symmetry.canonical), commun
+    à toutes les positions symétriques
+
+    Entrées :
+        state [GameState] : état de la partie
+
+    Sorties :
+        [(int, (bool, bool))] : (hash, symétrie qui donne la position canonique)
+    """
+
+    key, transform = canonical(state.board, state.last_play)
+    board = transformBoard(state.board, transform)
+    line, column, direction = key[-1]
+    last_play = {"line": line, "column": column, "direction": direction}
+
+    return GameState(board, state.playerNumber, last_play).positionHash(), transform
+
+
+class Book():
+    def __init__(self, path):
+        """
+        Ouvre un livre d'ouvertures : tableau numpy de 2n mots de 64 bits, les n
+        hash triés puis les n coups (coup << 48 | profondeur << 32 | score float32).
+        Le fichier est projeté en mémoire : seules les pages lues sont chargées.
+
+        Entrées :
+            path [str] : fichier du livre
+        """
+
+        words = np.load(path, mmap_mode='r')
+        n = len(words) // 2
+        self.hashes = words[:n]
+        self.entries = words[n:]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def open(cls, geometry, mode):
+        """
+        Ouvre le livre d'une variante et d'un niveau d'ia, une seule fois
+
+        Entrées :
+            geometry [Geometry] : variante du plateau
+            mode [int] : niveau de l'ia
+
+        Sorties :
+            [Book] : livre (None si le fichier n'existe pas)
+        """
+
+        path = BOOK_FILE.format(geometry.size, geometry.toWin, mode)
+        if path not in BOOKS:
+            BOOKS[path] = cls(path) if os.path.exists(path) else None
+
+        return BOOKS[path]
+
+    def lookup(self, state):
+        """
+        Cherche la position par dichotomie
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [((line, column, direction), float, int)] : (coup, score, profondeur) ou None
+        """
+
+        h, transform = bookHash(state)
+        i = np.searchsorted(self.hashes, np.uint64(h))
+        if i == len(self.hashes) or self.hashes[i] != h:
+            return None
+
+        entry = int(self.entries[i])
+        move = transformMove(unpackMove(entry >> 48), transform, state.geometry)
+        score = float(np.array(entry & 0xffffffff, dtype=np.uint32).view(np.float32))
+
+        return (move, score, entry >> 32 & 0xffff)
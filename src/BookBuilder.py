@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import numpy as np
+
+from Config import *
+from AI import AI
+from Book import BOOKS, bookHash
+from GameState import GameState
+from Geometry import getGeometry
+from Symmetry import transformMove
+from TranspositionTable import packMove
+
+
+def build(plies=BOOK_PLIES, depth=BOOK_DEPTH, mode=-3, geometry=None, path=None):
+    """
+    Cherche toutes les positions des plies premiers coups (une seule par
+    symétrie) à la profondeur depth et écrit le livre trié
+
+    Entrées :
+        plies [int] : nombre de coups joués depuis le plateau initial
+        depth [int] : profondeur de recherche de chaque position
+        mode [int] : niveau de l'ia (-1, -2 ou -3)
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+        path [str] : fichier du livre (BOOK_FILE si absent)
+
+    Sorties :
+        [int] : nombre de positions
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    path = BOOK_FILE.format(geometry.size, geometry.toWin, mode) if path is None else path
+
+    ai = AI(None, timeLimit=INFINITE, geometry=geometry)
+    ai.setMode(mode)
+
+    book = {}
+
+    def visit(state, ply):
+        if state.getWinner()[1] != None:
+            return
+
+        h, transform = bookHash(state)
+        if h in book:
+            return
+
+        # Table vidée : le coup ne dépend pas de l'ordre de construction.
+        # La recherche se fait sur une copie (l'historique des positions en fait partie)
+        ai.table.clear()
+        move, score = ai.iterativeDeepening(state.copy(), depth)
+        if move[0] is None:
+            return
+        book[h] = (transformMove(move, transform, geometry), score, ai.depth)
+
+        if ply < plies:
+            for move in state.getValid():
+                token = state.make(move)
+                visit(state, ply+1)
+                state.unmake(token)
+
+    start = time.monotonic()
+    visit(GameState(geometry=geometry), 0)
+
+    hashes = np.array(sorted(book), dtype=np.uint64)
+    entries = np.zeros(len(hashes), dtype=np.uint64)
+    for i, h in enumerate(hashes):
+        move, score, searched = book[int(h)]
+        score = int(np.array(score, dtype=np.float32).view(np.uint32))
+        entries[i] = packMove(move) << 48 | searched << 32 | score
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    np.save(path, np.concatenate([hashes, entries]))
+    BOOKS.pop(path, None)
+
+    print('{} positions ({} plies, depth {}) in {:.1f} s : {}'.format(
+        len(hashes), plies, depth, time.monotonic() - start, path))
+
+    return len(hashes)
+
+
+if __name__ == '__main__':
+    # python3 src/BookBuilder.py [plies] [depth] [mode...]
+    args = [int(arg) for arg in sys.argv[1:]]
+    plies = args[0] if len(args) > 0 else BOOK_PLIES
+    depth = args[1] if len(args) > 1 else BOOK_DEPTH
+    for mode in args[2:] or [-1, -2, -3]:
+        build(plies, depth, mode)
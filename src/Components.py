@@ -164,6 +164,10 @@ class playerButton(QPushButton):
             self.setIcon(QIcon('./images/ai_medium.png'))
         elif mode == -3:
             self.setIcon(QIcon('./images/ai_hard.png'))
+        elif mode == -4:
+            self.setIcon(QIcon('./images/ai_mcts.png'))
+        elif mode == -5:
+            self.setIcon(QIcon('./images/ai_ntuple.png'))
 
     def setClickable(self, val):
         """Active ou désactive le bouton"""
@@ -311,7 +315,7 @@ class playerSquare(QPushButton):
 
         Entrées :
             playerNumber [int] : numéro du joueur
-            playerMode [-1 ou +1] : -1 pour ia et +1 pour humain
+            playerMode [int] : mode de l'ia (-1 à -5) ou +1 pour humain
         """
 
         super().__init__()
@@ -326,6 +330,10 @@ class playerSquare(QPushButton):
             self.setIcon(QIcon('./images/ai_medium.png'))
         elif playerMode == -3:
             self.setIcon(QIcon('./images/ai_hard.png'))
+        elif playerMode == -4:
+            self.setIcon(QIcon('./images/ai_mcts.png'))
+        elif playerMode == -5:
+            self.setIcon(QIcon('./images/ai_ntuple.png'))
         else:
             self.setIcon(QIcon('./images/human.png'))
 
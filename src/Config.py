@@ -7,5 +7,43 @@ INFINITE = 1000000000
 WIN  = +10
 DRAW =   0
 LOSS = -10
+HEURISTIC_WIN = 1000 # Victoire pour les ia heuristiques (au-delà des heuristiques)
 
+AI_MODES = [-1, -2, -3, -4, -5] # Facile, moyen, difficile, Monte-Carlo, n-uplet
 AI_TIME = 1 # s
+AI_MARGIN = 0.05 # s, laissé à la partie après la recherche
+TT_ENTRIES = 1 << 18 # Entrées de la table de transposition d'une ia
+AI_WORKERS = 1 # Processus de recherche (1 : dans le processus de la partie, 0 : un par coeur)
+AI_ASPIRATION = 0.05 # Demi-largeur de la fenêtre d'aspiration (part du score de victoire)
+AI_BATCH_AFTER = 3 # Coups cherchés un par un à un coup des feuilles avant d'évaluer les autres ensemble
+AI_PONDER = True # L'ia cherche pendant le tour du joueur humain
+AI_STATS_LOG = None # Fichier où les statistiques de chaque coup des ia sont ajoutées (voir StatsLog), aucun si None
+
+# Monte-Carlo
+MCTS_PLAYOUTS = 100000 # Simulations maximales par coup (AI_TIME s'applique aussi)
+MCTS_EXPLORATION = 1.4 # Poids de l'exploration dans la borne UCT
+MCTS_ROLLOUT = 60 # Coups maximum d'une partie aléatoire (nulle au-delà)
+
+# Livre d'ouvertures (construit par BookBuilder.py)
+BOOK_FILE = './books/book_{}_{}_{}.npy' # Taille, cases pour gagner, niveau de l'ia
+BOOK_PLIES = 2 # Coups depuis le plateau initial
+BOOK_DEPTH = 4 # Profondeur de recherche de chaque position
+
+# Evaluation n-uplet (apprise par NTupleTrainer.py)
+NTUPLE_FILE = './weights/ntuple_{}_{}.npy' # Taille, cases pour gagner
+NTUPLE_GAMES = 60000 # Parties d'apprentissage contre elle-même
+NTUPLE_ALPHA = 0.005 # Pas d'apprentissage
+NTUPLE_EPSILON = 0.2 # Part des coups joués au hasard pendant l'apprentissage
+NTUPLE_MOVES = 60 # Coups maximum d'une partie d'apprentissage (nulle au-delà)
+
+# Tournoi entre ia sans interface (Tournament.py)
+TOURNAMENT_GAMES = 20 # Parties par paire d'ia (couleurs alternées)
+TOURNAMENT_WORKERS = 0 # Processus (0 : un par coeur)
+TOURNAMENT_OPENING = 2 # Premiers coups joués au hasard (même graine pour les deux couleurs)
+TOURNAMENT_MOVES = 100 # Coups maximum d'une partie (nulle au-delà)
+
+# Résultats de recherche gardés d'une partie à l'autre
+EVAL_STORE = False # L'ia consulte la base avant de chercher et y range ses résultats
+EVAL_STORE_FILE = './cache/evaluations.sqlite'
+EVAL_STORE_ROWS = 1000000 # Positions maximales, au-delà les moins récemment utilisées sont supprimées
+EVAL_STORE_KEEP = 0.75 # Part des positions gardées par une suppression
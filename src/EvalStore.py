@@ -0,0 +1,169 @@
+import os
+import sqlite3
+
+from Config import *
+from Book import bookHash
+from Symmetry import transformMove
+from TranspositionTable import packMove, unpackMove
+
+
+# Bases déjà ouvertes, par fichier
+STORES = {}
+
+
+def signed(h):
+    """Donne un hash de 64 bits sous la forme d'un entier signé (INTEGER de sqlite)"""
+
+    return h - (1 << 64) if h >= 1 << 63 else h
+
+
+class EvalStore():
+    def __init__(self, path=EVAL_STORE_FILE, rows=EVAL_STORE_ROWS):
+        """
+        Ouvre une base sqlite des résultats de recherche, gardée d'une partie à
+        l'autre : une ligne par position canonique (voir Book.bookHash), variante
+        et niveau d'ia, avec le coup de la recherche la plus profonde
+
+        Entrées :
+            path [str] : fichier de la base (créé si absent)
+            rows [int] : nombre maximal de lignes, au-delà les moins récemment
+                utilisées sont supprimées
+        """
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # L'ia peut chercher dans un autre fil que celui qui a ouvert la base,
+        # jamais dans deux à la fois
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS positions (
+                               hash INTEGER, size INTEGER, toWin INTEGER, mode INTEGER,
+                               depth INTEGER, move INTEGER, score REAL, used INTEGER,
+                               PRIMARY KEY (hash, size, toWin, mode))''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS positionsUsed ON positions (used)')
+        self.db.commit()
+
+        self.rows = rows
+        self.count, self.clock = self.db.execute(
+            'SELECT COUNT(*), COALESCE(MAX(used), 0) FROM positions').fetchone()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def open(cls, path=EVAL_STORE_FILE):
+        """
+        Ouvre une base une seule fois
+
+        Entrées :
+            path [str] : fichier de la base
+
+        Sorties :
+            [EvalStore] : base
+        """
+
+        if path not in STORES:
+            STORES[path] = cls(path)
+
+        return STORES[path]
+
+    def close(self):
+        """Ferme la base"""
+
+        self.db.close()
+        for path, store in list(STORES.items()):
+            if store is self:
+                del STORES[path]
+
+    def key(self, state, mode):
+        """
+        Donne la clé d'une position
+
+        Entrées :
+            state [GameState] : état de la partie
+            mode [int] : niveau de l'ia
+
+        Sorties :
+            [((int, int, int, int), (bool, bool))] : (clé, symétrie qui donne la position canonique)
+        """
+
+        h, transform = bookHash(state)
+
+        return (signed(h), state.geometry.size, state.geometry.toWin, mode), transform
+
+    def lookup(self, state, mode):
+        """
+        Cherche une position et la marque comme utilisée
+
+        Entrées :
+            state [GameState] : état de la partie
+            mode [int] : niveau de l'ia
+
+        Sorties :
+            [((line, column, direction), float, int)] : (coup, score, profondeur) ou None
+        """
+
+        key, transform = self.key(state, mode)
+        row = self.db.execute('''SELECT depth, move, score FROM positions
+                                 WHERE hash = ? AND size = ? AND toWin = ? AND mode = ?''', key).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.clock += 1
+        self.db.execute('''UPDATE positions SET used = ?
+                           WHERE hash = ? AND size = ? AND toWin = ? AND mode = ?''', (self.clock,) + key)
+        self.db.commit()
+
+        depth, move, score = row
+        return (transformMove(unpackMove(move), transform, state.geometry), score, depth)
+
+    def store(self, state, mode, depth, move, score):
+        """
+        Range le résultat d'une recherche, s'il est plus profond que celui déjà rangé
+
+        Entrées :
+            state [GameState] : état de la partie
+            mode [int] : niveau de l'ia
+            depth [int] : profondeur terminée
+            move [(line, column, direction)] : meilleur coup
+            score [float] : score du coup
+        """
+
+        key, transform = self.key(state, mode)
+        self.clock += 1
+        move = packMove(transformMove(move, transform, state.geometry))
+
+        cursor = self.db.execute('''UPDATE positions SET depth = ?, move = ?, score = ?, used = ?
+                                    WHERE hash = ? AND size = ? AND toWin = ? AND mode = ? AND depth < ?''',
+                                 (depth, move, score, self.clock) + key + (depth,))
+        if not cursor.rowcount:
+            cursor = self.db.execute('INSERT OR IGNORE INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                     key + (depth, move, score, self.clock))
+            self.count += cursor.rowcount
+
+        if self.count > self.rows:
+            self.compact()
+        self.db.commit()
+
+    def compact(self, keep=EVAL_STORE_KEEP):
+        """
+        Supprime les positions les moins récemment utilisées
+
+        Entrées :
+            keep [float] : part de la taille maximale gardée
+        """
+
+        remove = self.count - int(keep*self.rows)
+        if remove <= 0:
+            return
+
+        self.db.execute('''DELETE FROM positions WHERE rowid IN
+                           (SELECT rowid FROM positions ORDER BY used LIMIT ?)''', (remove,))
+        self.db.commit()
+        self.count -= remove
@@ -9,8 +9,11 @@ from PyQt5.QtWidgets import (QApplication, QGridLayout,
                              QLineEdit, QMainWindow,
                              QVBoxLayout, QWidget, QFileDialog)
 
+from Config import *
+from AIWorker import AIWorker
 from App import App
 from Replay import Replay
+from StatsLog import formatStats
 from Components import *
 
 
@@ -20,7 +23,10 @@ class Window(QMainWindow):
 
         super().__init__()
         self.title = 'Slideways'
+        self.aiWorker = None  # Fil de la recherche de l'ia en cours
+        self.statsMessage = None  # Statistiques du dernier coup d'une ia (barre d'état)
         self.app = App(self)
+        self.app.addStatsHook(self.showStats)
         self.firstStart = True
         self.replay = None
         self.initUI()
@@ -35,10 +41,65 @@ class Window(QMainWindow):
                 self, 'Nice try !', "Hardcore mode activated !\nYou have to beat me...", QMessageBox.Ok)
             event.ignore()
         else:
+            self.cancelAi()
+            for ai in self.app.ais:
+                if ai is not None:
+                    ai.stopPondering()
             if self.app.record.isRecording():
                 self.app.record.close()
             event.accept()
 
+    def searchAi(self, ai, game):
+        """
+        Cherche le coup de l'ia dans un autre fil : l'interface reste utilisable
+
+        Entrées :
+            ai [AI] : ia qui doit jouer
+            game [int] : manche de la recherche (voir App.aiPlayed)
+        """
+
+        # Une seule recherche à la fois : l'ia n'est utilisée que par un fil
+        self.cancelAi()
+        ai.cancel(False)
+
+        # Le signal est reçu dans le fil de l'interface, qui possède la fenêtre
+        self.aiWorker = AIWorker(ai, game)
+        self.aiWorker.played.connect(self.__aiPlayed)
+        self.aiWorker.start()
+
+    def cancelAi(self):
+        """Interrompt la recherche de l'ia en cours (son coup sera ignoré)"""
+
+        if self.aiWorker is not None and self.aiWorker.isRunning():
+            self.aiWorker.cancel()
+
+    def __aiPlayed(self, move, delta, game):
+        """
+        Reçoit le coup de l'ia et le joue après le délai choisi avec le curseur
+
+        Entrées :
+            move [(line, column, direction)] : coup de l'ia
+            delta [float] : durée de la recherche (s)
+            game [int] : manche de la recherche
+        """
+
+        waitTime = self.app.getAiTimer(self.app.getCurrentPlayer()) - delta
+        if delta > AI_TIME or waitTime <= 0:
+            self.app.aiPlayed(move, delta, game)
+        else:
+            QTimer.singleShot(int(1000*waitTime), lambda: self.app.aiPlayed(move, delta, game))
+
+    def showStats(self, stats):
+        """
+        Garde les statistiques du dernier coup de l'ia pour la barre d'état
+
+        Entrées :
+            stats [dict] : statistiques du coup (voir AI.moveStats)
+        """
+
+        self.statsMessage = formatStats(stats)
+        self.statusBar().showMessage(self.statsMessage)
+
     def keyPressEvent(self, event):
         """Est appelée lorsqu'une touche est pressée"""
 
@@ -114,7 +175,8 @@ class Window(QMainWindow):
                 windowLayout = self.winLayout(winner)
 
             else:
-                self.statusBar().showMessage('Tip : Click on player icon to change mode.')
+                self.statusBar().showMessage(
+                    self.statsMessage or 'Tip : Click on player icon to change mode.')
 
                 windowLayout = QGridLayout()
                 windowLayout.addLayout(self.scoreLayout(), 0, 0, 1, 0)
@@ -239,7 +301,7 @@ class Window(QMainWindow):
         nameSliderLayout1 = QVBoxLayout()
         nameSliderLayout1.setContentsMargins(5, 20, 5, 20)
 
-        if self.app.getPlayerMode(1) in [-1, -2, -3]:
+        if self.app.getPlayerMode(1) in AI_MODES:
             aiSliderWidget1.setEnabled(True)
             pb1.setAI(self.app.getPlayerMode(1))
             nameSliderLayout1.addWidget(
@@ -271,7 +333,7 @@ class Window(QMainWindow):
         nameSliderLayout2 = QVBoxLayout()
         nameSliderLayout2.setContentsMargins(5, 20, 5, 20)
 
-        if self.app.getPlayerMode(2) in [-1, -2, -3]:
+        if self.app.getPlayerMode(2) in AI_MODES:
             aiSliderWidget2.setEnabled(True)
             pb2.setAI(self.app.getPlayerMode(2))
             nameSliderLayout2.addWidget(
@@ -333,6 +395,12 @@ class Window(QMainWindow):
         elif pb.getMode() == -2:
             aiSliderWidget.setEnabled(True)
             self.app.setPlayerMode(playerNumber, -3)
+        elif pb.getMode() == -3:
+            aiSliderWidget.setEnabled(True)
+            self.app.setPlayerMode(playerNumber, -4)
+        elif pb.getMode() == -4:
+            aiSliderWidget.setEnabled(True)
+            self.app.setPlayerMode(playerNumber, -5)
         else:
             aiSliderWidget.setEnabled(False)
             self.app.setPlayerMode(playerNumber, 1)
@@ -0,0 +1,370 @@
+from Bitboard import Bitboard
+from NTuple import EMPTY, PLAYER_1, PLAYER_2, OUTSIDE
+from Zobrist import History
+from Symmetry import canonical
+
+
+class GameState():
+    def __init__(self, board=None, playerNumber=1, last_play=None, history=None, geometry=None):
+        """
+        Initialise un état de partie jouable et réversible (make / unmake)
+
+        Entrées :
+            board [Bitboard] : plateau (plateau initial si absent)
+            playerNumber [int] : numéro du joueur qui doit jouer
+            last_play [{"line", "column", "direction"}] : dernier coup joué
+            history [History] : positions déjà jouées (le plateau actuel en fait partie)
+            geometry [Geometry] : variante du plateau initial (celle de Config si absente)
+        """
+
+        self.board = Bitboard(geometry=geometry) if board is None else board
+        self.geometry = self.board.geometry
+        self.playerNumber = playerNumber
+        self.last_play = {"line": None, "column": None, "direction": None} if last_play is None else dict(last_play)
+
+        if history is None:
+            history = History()
+            history.add(self.board.hash, self.board.key())
+        self.history = history
+
+        self.winner = self.board.playerWin()
+
+        # Cases de chaque joueur par colonne et par ligne, comptées à la première
+        # évaluation puis tenues à jour par make / unmake (voir lineCounts)
+        self.counts = None
+
+        # Indices des segments et score n-uplet (voir tupleScore), tenus à jour de la même façon
+        self.tuples = None
+
+    @classmethod
+    def fromApp(cls, app):
+        """
+        Copie l'état de la partie en cours (le plateau de app n'est jamais modifié)
+
+        Entrées :
+            app [App] : partie en cours
+
+        Sorties :
+            [GameState] : état de la partie
+        """
+
+        history = History()
+        for array in app.record.getCurrentBoard():
+            board = Bitboard.fromArray(array, app.geometry)
+            history.add(board.hash, board.key())
+
+        return cls(Bitboard.fromArray(app.getBoard(), app.geometry), app.getCurrentPlayer(), app.last_play, history)
+
+    def copy(self):
+        """Donne une copie indépendante de l'état"""
+
+        history = History()
+        history.positions = {h: list(keys)
+                             for h, keys in self.history.positions.items()}
+
+        return GameState(self.board.copy(), self.playerNumber, self.last_play, history)
+
+    def getBoard(self):
+        """Donne le plateau sous la forme du tableau de App"""
+
+        return self.board.toArray()
+
+    def positionHash(self):
+        """
+        Donne le hash de la position : plateau, joueur qui doit jouer et dernier
+        coup (qui interdit certains coups), sans l'historique des répétitions
+
+        Sorties :
+            [int] : hash de la position
+        """
+
+        geometry = self.geometry
+        h = self.board.hash
+        if self.playerNumber == 2:
+            h ^= geometry.zobristTurn
+
+        line, column, direction = self.last_play["line"], self.last_play["column"], self.last_play["direction"]
+        if column != None:
+            h ^= geometry.zobristLastCell[line][column]
+        elif line != None:
+            h ^= geometry.zobristLastShift[line][direction > 0]
+
+        return h
+
+    def canonical(self):
+        """
+        Donne la clé commune aux positions symétriques (voir Symmetry.canonical)
+
+        Sorties :
+            [(tuple, (bool, bool))] : (clé canonique, symétrie qui donne la clé)
+        """
+
+        return canonical(self.board, self.last_play)
+
+    def lineCounts(self, playerNumber):
+        """
+        Donne les cases de chaque joueur par colonne et par ligne (même résultat que AI.countLines)
+
+        Entrées :
+            playerNumber [int] : numéro du joueur
+
+        Sorties :
+            [([int], [int], [int], [int])] : colonnes et lignes du joueur, puis de l'autre joueur
+        """
+
+        if self.counts is None:
+            geometry = self.geometry
+            columns = [None, [0]*geometry.width, [0]*geometry.width]
+            rows = [None, [0]*geometry.size, [0]*geometry.size]
+            for player in [1, 2]:
+                mask = self.board.masks[player]
+                while mask:
+                    bit = mask & -mask
+                    line, column = divmod(bit.bit_length()-1, geometry.stride)
+                    columns[player][column] += 1
+                    rows[player][line] += 1
+                    mask ^= bit
+            self.counts = (columns, rows)
+
+        columns, rows = self.counts
+        otherPlayer = (playerNumber % 2)+1
+
+        return (columns[playerNumber], rows[playerNumber], columns[otherPlayer], rows[otherPlayer])
+
+    def updateCounts(self, line, column, direction, old, new):
+        """
+        Met à jour les cases par colonne et par ligne avant qu'un coup soit joué sur le plateau
+
+        Entrées :
+            line [int] : ligne du coup
+            column [int] : colonne d'une case (None pour un décalage)
+            direction [+1 ou -1] : direction d'un décalage
+            old [int] : ancien contenu de la case
+            new [int] : nouveau contenu de la case
+        """
+
+        columns, rows = self.counts
+
+        if column != None:
+            if old:
+                columns[old][column] -= 1
+                rows[old][line] -= 1
+            if new:
+                columns[new][column] += 1
+                rows[new][line] += 1
+            return
+
+        # Décalage : la ligne garde ses cases, chacune change de colonne
+        stride = self.geometry.stride
+        for player in [1, 2]:
+            counts = columns[player]
+            pieces = self.board.masks[player] >> (line*stride) & self.geometry.rowMask
+            while pieces:
+                bit = pieces & -pieces
+                c = bit.bit_length()-1
+                counts[c] -= 1
+                counts[c+direction] += 1
+                pieces ^= bit
+
+    def tupleScore(self, network):
+        """
+        Donne le score n-uplet du plateau pour le joueur qui doit jouer
+        (même résultat que NTuple.score)
+
+        Entrées :
+            network [NTuple] : évaluation n-uplet
+
+        Sorties :
+            [float] : somme des entrées des segments
+        """
+
+        if self.tuples is None or self.tuples[0] is not network:
+            indices = network.stateIndices(self.board)
+            self.tuples = [network, indices,
+                           sum(network.table[s][i] for s, i in enumerate(indices)),
+                           sum(network.mirror[s][i] for s, i in enumerate(indices))]
+
+        return self.tuples[self.playerNumber+1]
+
+    def updateTuples(self, line, column, old, new):
+        """
+        Met à jour les indices des segments qui passent par une case
+
+        Entrées :
+            line [int] : ligne de la case
+            column [int] : colonne de la case
+            old [int] : ancien code de la case (son contenu si elle est sur le plateau)
+            new [int] : nouveau code de la case
+        """
+
+        network, indices, total1, total2 = self.tuples
+        table, mirror = network.table, network.mirror
+        for s, power in network.cellTuples[line*self.geometry.stride + column]:
+            i = indices[s]
+            j = i + (new-old)*power
+            total1 += table[s][j] - table[s][i]
+            total2 += mirror[s][j] - mirror[s][i]
+            indices[s] = j
+        self.tuples[2:] = total1, total2
+
+    def rowCodes(self, line):
+        """
+        Donne le code de chaque case d'une ligne dans les indices des segments (voir NTuple)
+
+        Entrées :
+            line [int] : ligne
+
+        Sorties :
+            [[int]] : codes des cases de la ligne
+        """
+
+        shift = line*self.geometry.stride
+        mask1 = self.board.masks[1] >> shift
+        mask2 = self.board.masks[2] >> shift
+        cells = self.board.cells >> shift
+
+        return [PLAYER_1 if mask1 >> column & 1 else PLAYER_2 if mask2 >> column & 1
+                else EMPTY if cells >> column & 1 else OUTSIDE
+                for column in range(self.geometry.width)]
+
+    def shiftTuples(self, line, before):
+        """
+        Met à jour les indices des segments qui passent par une ligne après un décalage
+
+        Entrées :
+            line [int] : ligne décalée
+            before [[int]] : codes des cases de la ligne avant le décalage (voir rowCodes)
+        """
+
+        for column, (old, new) in enumerate(zip(before, self.rowCodes(line))):
+            if old != new:
+                self.updateTuples(line, column, old, new)
+
+    def getWinner(self):
+        """Donne le gagnant(s) de la partie ou None"""
+
+        return self.winner
+
+    def isRepetition(self, move):
+        """
+        Vérifie si le coup recrée un plateau déjà joué
+
+        Entrées :
+            move [(line, column, direction)] : coup
+
+        Sorties :
+            [bool] : plateau déjà joué
+        """
+
+        line, column, direction = move
+        board = self.board
+
+        # Le plateau n'est joué (puis comparé) que si son hash est déjà connu
+        if board.hashAfter(line, column, self.playerNumber, direction) not in self.history.positions:
+            return False
+
+        if column != None:
+            pres = board.getCell(line, column)
+            board.coup(line=line, column=column, playerNumber=self.playerNumber)
+            res = self.history.contains(board.hash, board.key)
+            board.coup(line=line, column=column, playerNumber=pres)
+        else:
+            board.coup(line=line, direction=direction)
+            res = self.history.contains(board.hash, board.key)
+            board.coup(line=line, direction=-direction)
+
+        return res
+
+    def getValid(self):
+        """
+        Donne la liste des coups valides, dans le même ordre que App.getValid
+
+        Sorties :
+            [[(line, column, direction)]] : coups valides
+        """
+
+        board = self.board
+        playerNumber = self.playerNumber
+        last_line, last_column, last_direction = self.last_play["line"], self.last_play["column"], self.last_play["direction"]
+
+        size, maxOffset = self.geometry.size, self.geometry.maxOffset
+
+        moves = []
+        for line, offset in enumerate(board.offsets):
+            for column in range(offset, offset+size):
+                if board.getCell(line, column) != playerNumber and not (line == last_line and column == last_column):
+                    moves.append((line, column, None))
+
+        for direction in [-1, +1]:
+            for line, offset in enumerate(board.offsets):
+                if 0 <= offset+direction <= maxOffset and not (line == last_line and last_direction == -direction):
+                    moves.append((line, None, direction))
+
+        return [move for move in moves if not self.isRepetition(move)]
+
+    def make(self, move):
+        """
+        Joue un coup
+
+        Entrées :
+            move [(line, column, direction)] : coup
+
+        Sorties :
+            [tuple] : jeton à donner à unmake pour annuler le coup
+        """
+
+        line, column, direction = move
+        board = self.board
+        pres = board.getCell(line, column) if column != None else None
+        tuples = self.tuples[2:] if self.tuples is not None else None  # Scores n-uplet rendus tels quels par unmake
+        token = (move, pres, self.last_play, self.winner, tuples)
+
+        if self.counts is not None:
+            self.updateCounts(line, column, direction, pres, self.playerNumber)
+        if self.tuples is not None and column != None:
+            self.updateTuples(line, column, pres, self.playerNumber)
+        elif self.tuples is not None:
+            before = self.rowCodes(line)
+
+        self.last_play = board.coup(line=line, column=column,
+                                    playerNumber=self.playerNumber, direction=direction)
+        if self.tuples is not None and column == None:
+            self.shiftTuples(line, before)
+        self.history.add(board.hash, board.key())
+        self.winner = board.playerWinAt(self.last_play)
+        self.playerNumber = (self.playerNumber % 2)+1
+
+        return token
+
+    def unmake(self, token):
+        """
+        Annule un coup joué avec make
+
+        Entrées :
+            token [tuple] : jeton donné par make
+        """
+
+        (line, column, direction), pres, last_play, winner, tuples = token
+
+        if self.counts is not None:
+            self.updateCounts(line, column, -direction if column == None else None,
+                              (self.playerNumber % 2)+1, pres)
+        if self.tuples is not None and column != None:
+            self.updateTuples(line, column, (self.playerNumber % 2)+1, pres)
+
+        self.history.remove(self.board.hash)
+        if column != None:
+            self.board.coup(line=line, column=column, playerNumber=pres)
+        else:
+            if self.tuples is not None:
+                before = self.rowCodes(line)
+            self.board.coup(line=line, direction=-direction)
+            if self.tuples is not None:
+                self.shiftTuples(line, before)
+
+        if tuples is not None:
+            self.tuples[2:] = tuples
+
+        self.last_play = last_play
+        self.winner = winner
+        self.playerNumber = (self.playerNumber % 2)+1
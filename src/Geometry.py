@@ -0,0 +1,184 @@
+import random
+import numpy as np
+
+from Config import *
+
+
+class Geometry():
+    def __init__(self, size, toWin):
+        """
+        Précalcule les tables d'une variante du plateau
+
+        Entrées :
+            size [int] : nombre de lignes (et de cases par ligne)
+            toWin [int] : nombre de cases alignées pour gagner (<= size)
+        """
+
+        self.size = size
+        self.toWin = toWin
+        self.width = size+(size-1)*2
+        self.shape = (size, self.width)
+        self.maxOffset = 2*(size-1)
+
+        # Lignes dans l'ordre de parcours de App.playerWin (indices du tableau aplati)
+        def index(line, column):
+            return line*self.width + column
+
+        lines = [[index(l, c) for c in range(self.width)]
+                 for l in range(size)]
+        self.rows = slice(0, len(lines))
+        lines += [[index(l, self.width-1-i) for l in range(size)]
+                  for i in range(self.width)]  # Colonnes de np.rot90
+        self.columns = slice(self.rows.stop, len(lines))
+
+        diagonals = range((-size+1)+toWin-1, self.width-toWin+1)
+        lines += [[index(l, l+k) for l in range(size) if 0 <= l+k < self.width]
+                  for k in diagonals]  # Diagonnales de S-O vers N-E
+        lines += [[index(size-1-l, l+k) for l in range(size) if 0 <= l+k < self.width]
+                  for k in diagonals]  # Diagonnales de N-O vers S-E
+        self.diagonals = slice(self.columns.stop, len(lines))
+        self.lines = lines
+
+        # Lignes complétées par une case hors plateau (indice size*width, voir flatten)
+        self.lineIndex = np.full(
+            (len(lines), max(len(line) for line in lines)), size*self.width)
+        for i, line in enumerate(lines):
+            self.lineIndex[i][:len(line)] = line
+
+        # Segments gagnants : toWin cases consécutives d'une ligne
+        segments = []
+        segmentLine = []
+        for i, line in enumerate(lines):
+            for start in range(len(line)-toWin+1):
+                segments.append(line[start:start+toWin])
+                segmentLine.append(i)
+        self.segments = np.array(segments)
+        self.segmentLine = np.array(segmentLine)
+
+        # Matrices d'appartenance case / ligne (lignes et colonnes) et case /
+        # segment : (plateaux == joueur) @ matrice compte les cases du joueur
+        # de chaque ligne ou segment pour tout un tableau de plateaux à la fois
+        self.lineMatrix = np.zeros((size*self.width, self.columns.stop))
+        for i, line in enumerate(lines[:self.columns.stop]):
+            self.lineMatrix[line, i] = 1
+        self.segmentMatrix = np.zeros((size*self.width, len(segments)))
+        for s, segment in enumerate(segments):
+            self.segmentMatrix[segment, s] = 1
+
+        # Segments passant par chaque case, et segments non horizontaux passant par chaque ligne
+        cellSegments = [[] for i in range(size*self.width)]
+        rowSegments = [[] for l in range(size)]
+        for s, segment in enumerate(segments):
+            horizontal = self.segmentLine[s] < self.rows.stop
+            for i in segment:
+                cellSegments[i].append(s)
+                if not horizontal:
+                    rowSegments[i // self.width].append(s)
+        self.cellSegments = [np.array(s, dtype=int) for s in cellSegments]
+        self.rowSegments = [np.array(sorted(set(s)), dtype=int)
+                            for s in rowSegments]
+
+        # Mêmes tables pour le Bitboard : la case (line, column) est le bit
+        # line*stride+column, une colonne de garde sépare les lignes
+        self.stride = self.width + 1
+        self.rowMask = (1 << self.width) - 1
+        self.directions = (1, self.stride, self.stride+1, self.stride-1)
+        # Dans chaque direction : segment de toWin cases qui commence au bit 0,
+        # décalage de chacune de ses cases et lignes qu'il traverse (aucune
+        # pour un segment horizontal, que le décalage de sa ligne ne coupe pas)
+        self.segmentSteps = [(sum(1 << (k*d) for k in range(toWin)), [k*d for k in range(toWin)],
+                              0 if d == 1 else (1 << toWin) - 1)
+                             for d in self.directions]
+        self.lineCells = (1 << size) - 1
+
+        def bit(i):
+            return (i // self.width)*self.stride + i % self.width
+
+        def mask(cells):
+            m = 0
+            for i in cells:
+                m |= 1 << bit(i)
+            return m
+
+        self.lineBits = [[bit(i) for i in line] for line in lines]
+        self.segmentMasks = [mask(segment) for segment in segments]
+        self.cellSegmentMasks = [[] for i in range(size*self.stride)]
+        for i, s in enumerate(self.cellSegments):
+            self.cellSegmentMasks[bit(i)] = [self.segmentMasks[j] for j in s]
+        self.rowSegmentMasks = [[self.segmentMasks[j] for j in s]
+                                for s in self.rowSegments]
+
+        # Hash de Zobrist : une clé aléatoire par (valeur de la case + 1, ligne,
+        # colonne). La case vide a une clé nulle : seuls les bords et les pions comptent.
+        rand = random.Random(0x51de + size)
+        self.zobrist = np.array([[[0 if value == 0 else rand.getrandbits(64)
+                                   for c in range(self.width)]
+                                  for l in range(size)]
+                                 for value in range(-1, 3)], dtype=np.uint64)
+        self.zobristKeys = self.zobrist.tolist()
+
+        # Clés du joueur qui doit jouer et du dernier coup (voir GameState.positionHash)
+        self.zobristTurn = rand.getrandbits(64)
+        self.zobristLastCell = [[rand.getrandbits(64) for c in range(self.width)]
+                                for l in range(size)]
+        self.zobristLastShift = [[rand.getrandbits(64) for direction in [-1, +1]]
+                                 for l in range(size)]
+        self.zobristRoot = rand.getrandbits(64)  # Recherche faite pour le joueur 2
+
+        # Contribution des bords d'une ligne selon la colonne de sa première case
+        self.zobristPadding = [[int(np.bitwise_xor.reduce(self.zobrist[0][l][:offset]))
+                                ^ int(np.bitwise_xor.reduce(self.zobrist[0][l][offset+size:]))
+                                for offset in range(self.maxOffset+1)]
+                               for l in range(size)]
+
+    def emptyBoard(self):
+        """
+        Plateau initial
+
+        Sorties :
+            [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        """
+
+        ml = [-1 for x in range(self.size-1)]
+        ca = [0 for l in range(self.size)]
+        mr = [-1 for x in range(self.size-1)]
+
+        return np.array([ml + ca + mr for l in range(self.size)], dtype=int)
+
+    def flatten(self, board):
+        """
+        Aplatit un ou plusieurs plateaux en ajoutant la case hors plateau utilisée par lineIndex
+
+        Entrées :
+            board [[int,int,...],...] : plateau (ou tableau de plateaux)
+
+        Sorties :
+            [[int,...]] : plateau(x) aplati(s)
+        """
+
+        board = np.asarray(board)
+        flat = board.reshape(board.shape[:-2] + (-1,))
+        padding = np.full(flat.shape[:-1] + (1,), -1, dtype=flat.dtype)
+
+        return np.concatenate([flat, padding], axis=-1)
+
+
+GEOMETRIES = {}
+
+
+def getGeometry(size=BOARD_SIZE, toWin=NUMBER_CASE_TO_WIN):
+    """
+    Donne les tables d'une variante, calculées une seule fois par variante
+
+    Entrées :
+        size [int] : nombre de lignes (et de cases par ligne)
+        toWin [int] : nombre de cases alignées pour gagner (<= size)
+
+    Sorties :
+        [Geometry] : tables de la variante
+    """
+
+    if (size, toWin) not in GEOMETRIES:
+        GEOMETRIES[(size, toWin)] = Geometry(size, toWin)
+
+    return GEOMETRIES[(size, toWin)]
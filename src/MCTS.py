@@ -0,0 +1,217 @@
+import math
+import random
+import time
+
+from Config import *
+
+
+class Node():
+    def __init__(self, state, move=None, parent=None):
+        """
+        Noeud de l'arbre de recherche : la position de state après move
+
+        Entrées :
+            state [GameState] : état de la partie dans cette position
+            move [(line, column, direction)] : coup qui mène à ce noeud (None à la racine)
+            parent [Node] : noeud parent (None à la racine)
+        """
+
+        self.move = move
+        self.parent = parent
+        self.hash = state.positionHash()
+        self.playerNumber = state.playerNumber  # Joueur qui doit jouer
+        self.winner = state.getWinner()
+
+        self.children = {}
+        self.untried = state.getValid() if self.winner[1] == None else []
+        random.shuffle(self.untried)
+
+        # Résultats du point de vue du joueur qui a joué move
+        self.visits = 0
+        self.wins = 0.0
+
+    def isTerminal(self):
+        """La partie est-elle finie dans cette position ?"""
+
+        return self.winner[1] != None or (not self.untried and not self.children)
+
+    def select(self, exploration):
+        """
+        Choisit l'enfant qui maximise la borne UCT
+
+        Entrées :
+            exploration [float] : poids de l'exploration
+
+        Sorties :
+            [Node] : enfant choisi
+        """
+
+        log = math.log(self.visits)
+
+        return max(self.children.values(),
+                   key=lambda child: child.wins/child.visits + exploration*math.sqrt(log/child.visits))
+
+
+class MCTS():
+    def __init__(self, timeLimit=AI_TIME-AI_MARGIN, playouts=MCTS_PLAYOUTS, exploration=MCTS_EXPLORATION):
+        """
+        Initialise la recherche arborescente Monte-Carlo (UCT)
+
+        Entrées :
+            timeLimit [float] : temps accordé à chaque coup (s)
+            playouts [int] : nombre maximal de simulations par coup
+            exploration [float] : poids de l'exploration dans la borne UCT
+        """
+
+        self.timeLimit = timeLimit
+        self.playouts = playouts
+        self.exploration = exploration
+
+        self.root = None
+        self.done = 0  # Simulations de la dernière recherche
+        self.cancelled = False  # Recherche interrompue depuis un autre fil (voir AI.cancel)
+
+    def search(self, state):
+        """
+        Cherche le meilleur coup, en repartant de l'arbre du coup précédent s'il
+        contient la position
+
+        Entrées :
+            state [GameState] : état de la partie (joué puis annulé avec make / unmake)
+
+        Sorties :
+            [((line, column, direction), float)] : coup le plus visité avec sa part de victoires
+        """
+
+        deadline = time.monotonic() + self.timeLimit
+        root = self.root = self.findRoot(state)
+        self.done = 0
+
+        if not root.children and len(root.untried) == 1:
+            return (root.untried[0], None)
+
+        while self.done < self.playouts and time.monotonic() < deadline and not self.cancelled:
+            self.playout(state, root)
+            self.done += 1
+
+        if not root.children:
+            return ((None, None, None), None)
+
+        best = max(root.children.values(), key=lambda child: child.visits)
+
+        return (best.move, best.wins/best.visits)
+
+    def findRoot(self, state):
+        """
+        Cherche la position dans l'arbre de la recherche précédente : racine,
+        ou position après le coup de l'ia et la réponse de l'adversaire
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [Node] : nouvelle racine (nouvel arbre si la position est absente)
+        """
+
+        h = state.positionHash()
+        candidates = []
+        if self.root is not None:
+            candidates.append(self.root)
+            for child in self.root.children.values():
+                candidates.extend(child.children.values())
+
+        for node in candidates:
+            if node.hash == h and node.playerNumber == state.playerNumber:
+                node.parent = None  # Le reste de l'ancien arbre peut être libéré
+                return node
+
+        return Node(state)
+
+    def playout(self, state, root):
+        """
+        Une simulation : sélection, expansion, partie aléatoire puis rétropropagation
+
+        Entrées :
+            state [GameState] : état de la partie à la racine (rendu inchangé)
+            root [Node] : racine de l'arbre
+        """
+
+        node = root
+        tokens = []
+
+        # Sélection
+        while not node.untried and node.children:
+            node = node.select(self.exploration)
+            tokens.append(state.make(node.move))
+
+        # Expansion
+        if node.untried:
+            move = node.untried.pop()
+            tokens.append(state.make(move))
+            child = Node(state, move, node)
+            node.children[move] = child
+            node = child
+
+        # Simulation
+        if node.winner[1] != None:
+            winner = node.winner[1]
+        elif node.untried:
+            winner = self.rollout(state)
+        else:
+            winner = None  # Aucun coup possible
+
+        for token in reversed(tokens):
+            state.unmake(token)
+
+        # Rétropropagation
+        while node is not None:
+            node.visits += 1
+            if winner == None:
+                node.wins += 0.5
+            elif winner != node.playerNumber:  # Le joueur qui a joué move a gagné
+                node.wins += 1
+            node = node.parent
+
+    def rollout(self, state):
+        """
+        Joue des coups aléatoires depuis state jusqu'à une victoire ou MCTS_ROLLOUT coups.
+        Les répétitions ne sont pas vérifiées : seules les règles locales le sont.
+
+        Entrées :
+            state [GameState] : état de la partie (rendu inchangé)
+
+        Sorties :
+            [int] : numéro du joueur gagnant (ou None)
+        """
+
+        board = state.board.copy()
+        geometry = board.geometry
+        size, maxOffset = geometry.size, geometry.maxOffset
+        playerNumber = state.playerNumber
+        last_play = state.last_play
+        moves = size*size + 2*size
+
+        for i in range(MCTS_ROLLOUT):
+            while True:
+                k = random.randrange(moves)
+                if k < size*size:  # Case
+                    line, column = divmod(k, size)
+                    column += board.offsets[line]
+                    if board.getCell(line, column) != playerNumber and not (
+                            line == last_play["line"] and column == last_play["column"]):
+                        last_play = board.coup(line=line, column=column, playerNumber=playerNumber)
+                        break
+                else:  # Décalage
+                    line, direction = divmod(k - size*size, 2)
+                    direction = 2*direction - 1
+                    if 0 <= board.offsets[line]+direction <= maxOffset and not (
+                            line == last_play["line"] and last_play["direction"] == -direction):
+                        last_play = board.coup(line=line, direction=direction)
+                        break
+
+            winner = board.playerWinAt(last_play)[1]
+            if winner != None:
+                return winner
+            playerNumber = (playerNumber % 2)+1
+
+        return None
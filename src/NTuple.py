@@ -0,0 +1,165 @@
+import os
+import numpy as np
+
+from Config import *
+
+
+# Réseaux déjà ouverts, par fichier
+NETWORKS = {}
+
+# Contenu d'une case dans l'indice d'un segment (PLAYER_1 : joueur qui doit jouer)
+EMPTY, PLAYER_1, PLAYER_2, OUTSIDE = range(4)
+
+
+class NTuple():
+    def __init__(self, geometry, weights=None):
+        """
+        Initialise une évaluation n-uplet : une table par segment gagnant,
+        indexée par le contenu de ses toWin cases (chiffres en base 4, vus du
+        joueur qui doit jouer). Le score d'un plateau pour le joueur qui doit
+        jouer est la somme des entrées de ses segments.
+
+        Entrées :
+            geometry [Geometry] : variante du plateau
+            weights [np.array] : tables (segments, 4**toWin) (nulles si absentes)
+        """
+
+        self.geometry = geometry
+        toWin = geometry.toWin
+        segments = len(geometry.segments)
+
+        self.weights = np.zeros((segments, 4**toWin)) if weights is None else np.asarray(weights, dtype=float)
+        self.powers = 4**np.arange(toWin)
+        self.segmentIds = np.arange(segments)
+
+        # Code de chaque valeur du tableau de App (-1 hors plateau, 0, 1, 2)
+        self.codes = np.array([OUTSIDE, EMPTY, PLAYER_1, PLAYER_2])
+
+        # Indice du même segment avec les joueurs échangés
+        digits = np.arange(4**toWin)[:, np.newaxis] // self.powers % 4
+        swapped = np.where(digits == PLAYER_1, PLAYER_2, np.where(digits == PLAYER_2, PLAYER_1, digits))
+        self.swap = swapped @ self.powers
+
+        # Tables pour GameState (mise à jour par make / unmake, voir GameState.tupleScore) :
+        # cases de chaque segment et segments de chaque case du Bitboard
+        def bit(i):
+            return int(i // geometry.width)*geometry.stride + int(i % geometry.width)
+
+        self.segmentBits = [[(bit(i), 4**k) for k, i in enumerate(segment)] for segment in geometry.segments]
+        self.cellTuples = [[] for i in range(geometry.size*geometry.stride)]
+        for s, cells in enumerate(self.segmentBits):
+            for b, power in cells:
+                self.cellTuples[b].append((s, power))
+        self.table = self.weights.tolist()
+        self.mirror = self.weights[:, self.swap].tolist()  # Entrées vues du joueur 2
+
+    @classmethod
+    def open(cls, geometry):
+        """
+        Ouvre les tables d'une variante, une seule fois
+
+        Entrées :
+            geometry [Geometry] : variante du plateau
+
+        Sorties :
+            [NTuple] : évaluation (None si le fichier n'existe pas)
+        """
+
+        path = NTUPLE_FILE.format(geometry.size, geometry.toWin)
+        if path not in NETWORKS:
+            NETWORKS[path] = cls(geometry, np.load(path)) if os.path.exists(path) else None
+
+        return NETWORKS[path]
+
+    def save(self, path):
+        """
+        Enregistre les tables (float32)
+
+        Entrées :
+            path [str] : fichier des tables
+        """
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        np.save(path, self.weights.astype(np.float32))
+
+    def indices(self, boards, toMove=1):
+        """
+        Donne l'indice de chaque segment
+
+        Entrées :
+            boards [[board]] : tableau de App (ou tableau (n, lignes, colonnes) de plateaux)
+            toMove [int] : joueur qui doit jouer
+
+        Sorties :
+            [np.array] : indices (segments) (ou (n, segments))
+        """
+
+        boards = np.asarray(boards)
+        flat = boards.reshape(boards.shape[:-2] + (-1,))
+        indices = self.codes[flat[..., self.geometry.segments] + 1] @ self.powers
+
+        return indices if toMove == 1 else self.swap[indices]
+
+    def score(self, indices):
+        """Donne la somme des entrées des segments (score du joueur qui doit jouer, voir indices)"""
+
+        return self.weights[self.segmentIds, indices].sum(axis=-1)
+
+    def evaluate(self, boards, playerNumber, toMove):
+        """
+        Evalue un plateau (ou un tableau de plateaux) pour un joueur
+
+        Entrées :
+            boards [[board]] : tableau de App (ou tableau (n, lignes, colonnes) de plateaux)
+            playerNumber [int] : numéro du joueur
+            toMove [int] : joueur qui doit jouer
+
+        Sorties :
+            [float] : score entre -1 et 1 (un par plateau)
+        """
+
+        value = np.tanh(self.score(self.indices(boards, toMove)))
+
+        return value if playerNumber == toMove else -value
+
+    def stateIndices(self, board):
+        """
+        Donne l'indice de chaque segment d'un Bitboard, vu du joueur 1 (même résultat que indices)
+
+        Entrées :
+            board [Bitboard] : plateau
+
+        Sorties :
+            [[int]] : indices
+        """
+
+        return [self.segmentIndex(board, s) for s in range(len(self.segmentBits))]
+
+    def segmentIndex(self, board, s):
+        """Donne l'indice du segment s d'un Bitboard"""
+
+        mask1, mask2, cells = board.masks[1], board.masks[2], board.cells
+        i = 0
+        for b, power in self.segmentBits[s]:
+            if mask1 >> b & 1:
+                i += PLAYER_1*power
+            elif mask2 >> b & 1:
+                i += PLAYER_2*power
+            elif not cells >> b & 1:
+                i += OUTSIDE*power
+
+        return i
+
+    def update(self, indices, error):
+        """
+        Corrige les entrées des segments d'un plateau
+
+        Entrées :
+            indices [np.array] : indices des segments (voir indices)
+            error [float] : correction du score du joueur qui doit jouer
+        """
+
+        self.weights[self.segmentIds, indices] += error
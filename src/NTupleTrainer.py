@@ -0,0 +1,106 @@
+import random
+import sys
+import time
+import numpy as np
+
+from Config import *
+from Bitboard import successors, winners
+from GameState import GameState
+from Geometry import getGeometry
+from NTuple import NETWORKS, NTuple
+
+
+def train(games=NTUPLE_GAMES, alpha=NTUPLE_ALPHA, epsilon=NTUPLE_EPSILON, geometry=None, path=None, seed=0):
+    """
+    Apprend les tables n-uplet par des parties contre elles-mêmes (différences
+    temporelles sur les plateaux obtenus après chaque coup) et les enregistre
+
+    Entrées :
+        games [int] : nombre de parties
+        alpha [float] : pas d'apprentissage
+        epsilon [float] : part des coups joués au hasard
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+        path [str] : fichier des tables (NTUPLE_FILE si absent)
+        seed [int] : graine du générateur
+
+    Sorties :
+        [NTuple] : évaluation apprise
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    path = NTUPLE_FILE.format(geometry.size, geometry.toWin) if path is None else path
+
+    random.seed(seed)
+    network = NTuple(geometry)
+    results = [0, 0, 0]  # Nulles, victoires du joueur 1, du joueur 2
+
+    start = time.monotonic()
+    for game in range(games):
+        state = GameState(geometry=geometry)
+        previous = None  # Indices des segments du plateau obtenu par le dernier coup
+        winner = 0
+
+        for ply in range(NTUPLE_MOVES):
+            moves = state.getValid()
+            if not moves:
+                break
+
+            # Score de chaque coup pour le joueur qui le joue (1 s'il gagne) : opposé
+            # du score du plateau obtenu pour l'adversaire, qui doit alors jouer
+            playerNumber = state.playerNumber
+            boards = successors(state.getBoard(), moves, playerNumber)
+            indices = network.indices(boards, (playerNumber % 2)+1)
+            values = -np.tanh(network.score(indices))
+            won = winners(boards, geometry)
+            values = np.where(won == playerNumber, 1.0, np.where(won == 0, values, -1.0))
+
+            i = random.randrange(len(moves)) if random.random() < epsilon else int(np.argmax(values))
+
+            # Le plateau précédent vaut pour playerNumber, qui doit y jouer, le score de son coup
+            if previous is not None:
+                learn(network, previous, values[i], alpha)
+            previous = indices[i]
+
+            state.make(moves[i])
+            winner = state.getWinner()[1]
+            if winner != None:
+                # L'adversaire de playerNumber doit jouer sur le plateau obtenu
+                learn(network, previous, -1.0 if winner == playerNumber else 1.0 if winner in [1, 2] else 0.0, alpha)
+                break
+        else:
+            learn(network, previous, 0.0, alpha)  # Partie trop longue : nulle
+
+        results[winner or 0] += 1
+
+        if (game+1) % 1000 == 0:
+            print('{} games in {:.0f} s (draws {}, player 1 {}, player 2 {})'.format(
+                game+1, time.monotonic() - start, *results))
+
+    network.save(path)
+    NETWORKS.pop(path, None)
+    print('{} games in {:.1f} s : {}'.format(games, time.monotonic() - start, path))
+
+    return network
+
+
+def learn(network, indices, target, alpha):
+    """
+    Rapproche le score d'un plateau de target
+
+    Entrées :
+        network [NTuple] : évaluation apprise
+        indices [np.array] : indices des segments du plateau (vus du joueur qui doit jouer)
+        target [float] : score visé pour le joueur qui doit jouer (entre -1 et 1)
+        alpha [float] : pas d'apprentissage
+    """
+
+    value = np.tanh(network.score(indices))
+    network.update(indices, alpha*(target - value)*(1 - value*value))
+
+
+if __name__ == '__main__':
+    # python3 src/NTupleTrainer.py [games] [size] [toWin]
+    args = [int(arg) for arg in sys.argv[1:]]
+    games = args[0] if len(args) > 0 else NTUPLE_GAMES
+    geometry = getGeometry(*args[1:3]) if len(args) > 2 else None
+    train(games, geometry=geometry)
@@ -0,0 +1,343 @@
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Config import *
+from AI import AI
+from Bitboard import Bitboard
+from GameState import GameState
+from Geometry import getGeometry
+from MCTS import MCTS
+from TranspositionTable import SharedTranspositionTable
+from Zobrist import History
+
+
+# Processus de recherche partagés par toutes les ia, gardés d'un coup à l'autre
+POOLS = {}
+
+# Dans chaque processus de recherche : ia gardées d'un coup à l'autre (table de
+# transposition, arbre Monte-Carlo) par variante et par mode
+SEARCHERS = {}
+
+
+def getPool(workers):
+    """
+    Donne les processus de recherche, démarrés une seule fois
+
+    Entrées :
+        workers [int] : nombre de processus
+
+    Sorties :
+        [ProcessPoolExecutor] : processus de recherche
+    """
+
+    if workers not in POOLS:
+        # spawn : les processus ne copient pas l'interface (PyQt) du processus de la partie
+        POOLS[workers] = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn'))
+        POOLS[workers].submit(os.getpid)  # Démarre les processus sans attendre le premier coup
+
+    return POOLS[workers]
+
+
+def packState(state):
+    """
+    Donne un état de partie transmissible à un processus de recherche
+
+    Entrées :
+        state [GameState] : état de la partie
+
+    Sorties :
+        [tuple] : données de l'état (voir unpackState)
+    """
+
+    geometry = state.geometry
+
+    return ((geometry.size, geometry.toWin), state.board.masks, state.board.offsets,
+            state.playerNumber, state.last_play, state.history.positions)
+
+
+def unpackState(data):
+    """
+    Reconstruit un état de partie reçu par un processus de recherche
+
+    Entrées :
+        data [tuple] : données de l'état (voir packState)
+
+    Sorties :
+        [GameState] : état de la partie
+    """
+
+    variant, masks, offsets, playerNumber, last_play, positions = data
+    geometry = getGeometry(*variant)
+    history = History()
+    history.positions = positions
+
+    return GameState(Bitboard(masks, offsets, geometry=geometry), playerNumber, last_play, history)
+
+
+def searchMoves(data, mode, moves, deadline, maxDepth=None, tableName=None):
+    """
+    Cherche une partie des coups de la racine (dans un processus de recherche)
+
+    Entrées :
+        data [tuple] : état de la partie (voir packState)
+        mode [int] : niveau de l'ia (-1, -2 ou -3)
+        moves [[(line, column, direction)]] : coups cherchés à la racine
+        deadline [float] : fin de la recherche (time.monotonic, horloge commune aux processus)
+        maxDepth [int] : profondeur maximale (illimitée si absente)
+        tableName [str] : table de transposition partagée (table propre au processus si absent)
+
+    Sorties :
+        [(int, dict, [(int, (line, column, direction), int)])] :
+            (processus, compteurs de la recherche (voir AI.counters),
+            (profondeur, coup, score) de chaque profondeur terminée)
+    """
+
+    state = unpackState(data)
+    key = (state.geometry.size, state.geometry.toWin, mode, tableName)
+    if key not in SEARCHERS:
+        if tableName is None:
+            SEARCHERS[key] = AI(None, geometry=state.geometry)
+        else:
+            SEARCHERS[key] = AI(None, tableEntries=0, geometry=state.geometry)
+            SEARCHERS[key].table = SharedTranspositionTable(name=tableName)
+        SEARCHERS[key].setMode(mode)
+
+    ai = SEARCHERS[key]
+    ai.timeLimit = deadline - time.monotonic()
+    ai.iterativeDeepening(state, maxDepth, moves)
+
+    return (os.getpid(), ai.counters(), ai.iterations)
+
+
+def searchTree(data, deadline, seed, playouts=MCTS_PLAYOUTS):
+    """
+    Fait grandir un arbre Monte-Carlo indépendant (dans un processus de recherche)
+
+    Entrées :
+        data [tuple] : état de la partie (voir packState)
+        deadline [float] : fin de la recherche (time.monotonic, horloge commune aux processus)
+        seed [int] : graine du générateur de ce processus
+        playouts [int] : nombre maximal de simulations
+
+    Sorties :
+        [(int, int, {(line, column, direction): (int, float)})] :
+            (processus, simulations, (visites, victoires) de chaque coup de la racine)
+    """
+
+    state = unpackState(data)
+    key = (state.geometry.size, state.geometry.toWin, -4)
+    if key not in SEARCHERS:
+        SEARCHERS[key] = MCTS()
+
+    random.seed(seed)
+    mcts = SEARCHERS[key]
+    mcts.timeLimit = deadline - time.monotonic()
+    mcts.playouts = playouts
+    mcts.search(state)
+
+    return (os.getpid(), mcts.done,
+            {move: (child.visits, child.wins) for move, child in mcts.root.children.items()})
+
+
+class ParallelAI(AI):
+    def __init__(self, app, workers=AI_WORKERS, timeLimit=AI_TIME-AI_MARGIN, shared=True):
+        """
+        Initialise une ia qui répartit sa recherche sur plusieurs processus
+
+        Entrées :
+            app [App] : partie en cours
+            workers [int] : nombre de processus (0 pour un par coeur)
+            timeLimit [float] : temps accordé à chaque coup (s)
+            shared [bool] : les processus partagent une table de transposition
+                (sinon chacun garde la sienne)
+        """
+
+        super().__init__(app, timeLimit, tableEntries=0 if shared else TT_ENTRIES)
+
+        # La table partagée remplace celle de l'ia : newSearch y compte les
+        # recherches et la vide quand le mode change, pour tous les processus
+        self.shared = shared
+        if shared:
+            self.table = SharedTranspositionTable()
+
+        self.workers = workers if workers else os.cpu_count()
+        self.workerNodes = {}  # Noeuds (ou simulations) de chaque processus au dernier coup
+        self.seed = 0
+
+        getPool(self.workers)
+
+    def chooseMove(self, state):
+        """
+        Choisit le coup : livre, base des résultats puis recherche des processus
+
+        Entrées :
+            state [GameState] : état de la partie (copie)
+
+        Sorties :
+            [((line, column, direction), str)] : coup avec son origine (voir AI.chooseMove)
+        """
+
+        # Ce qui a été cherché pendant le tour de l'adversaire est dans la table partagée
+        self.stopPondering()
+        self.resetCounters()
+        self.setMode(self.mode)
+
+        if self.mode == -4:
+            return self.searchTrees(state)[0], 'mcts'
+
+        move, source = self.bookMove(state), 'book'
+        if move is None:
+            move, source = self.storedMove(state), 'store'
+        if move is not None:
+            return move, source
+
+        best = self.searchRoot(state)
+        self.storeResult(state, best)
+
+        return best[0], 'search'
+
+    def resetCounters(self):
+        """Remet à zéro les compteurs additionnés des processus (voir counters)"""
+
+        super().resetCounters()
+        self.workerCounters = {"nodes": 0, "evaluations": 0, "probes": 0, "hits": 0, "cutoffs": 0}
+        self.workerNodes = {}
+
+    def counters(self):
+        """Donne les compteurs de la dernière recherche, additionnés sur les processus (voir AI.counters)"""
+
+        return dict(self.workerCounters)
+
+    def moveStats(self, state, move, source, elapsed):
+        """
+        Statistiques d'un coup de l'ia (voir AI.moveStats), avec les noeuds (ou
+        simulations) de chaque processus ('workerNodes', vide sans recherche)
+        """
+
+        stats = super().moveStats(state, move, source, elapsed)
+        stats["workerNodes"] = [self.workerNodes[pid] for pid in sorted(self.workerNodes)]
+
+        return stats
+
+    def searchRoot(self, state, maxDepth=None):
+        """
+        Répartit les coups de la racine entre les processus, chacun les cherche
+        en approfondissement itératif, puis garde le meilleur à la plus grande
+        profondeur terminée par tous
+
+        Entrées :
+            state [GameState] : état de la partie
+            maxDepth [int] : profondeur maximale (illimitée si absente)
+
+        Sorties :
+            [((line, column, direction), score)] : meilleur coup avec son score
+        """
+
+        deadline = time.monotonic() + self.timeLimit
+        self.newSearch(state)
+        valid = state.getValid()
+        if self.threats and valid:
+            win = self.winningMove(state, valid)
+            if win is not None:
+                self.depth = self.searchDepth = 1
+                return (win, self.winScore)
+            valid = self.blockingMoves(state, valid) or valid
+        if len(valid) <= 1:
+            return (valid[0], None) if valid else ((None, None, None), None)
+
+        # Les meilleurs coups connus sont répartis en premier entre les processus
+        moves = self.orderMoves(state, valid, self.tableMove(state), 0)
+        workers = min(self.workers, len(moves))
+        shares = [moves[i::workers] for i in range(workers)]
+
+        data = packState(state)
+        pool = getPool(self.workers)
+        tableName = self.table.name if self.shared else None
+        results = list(pool.map(searchMoves, [data]*workers, [self.mode]*workers, shares,
+                                [deadline]*workers, [maxDepth]*workers, [tableName]*workers))
+
+        self.workerNodes = {}
+        for pid, counters, iterations in results:
+            self.workerNodes[pid] = self.workerNodes.get(pid, 0) + counters["nodes"]
+            for name, count in counters.items():
+                self.workerCounters[name] += count
+        self.nodes = sum(self.workerNodes.values())
+
+        best = self.merge([iterations for pid, counters, iterations in results])
+        self.searchDepth = self.depth
+
+        return (moves[0], None) if best is None else best
+
+    def merge(self, results):
+        """
+        Choisit le meilleur coup parmi les résultats des processus, toujours de
+        la même façon pour les mêmes résultats
+
+        Entrées :
+            results [[[(int, (line, column, direction), int)]]] : profondeurs terminées de chaque processus
+
+        Sorties :
+            [((line, column, direction), score)] : meilleur coup avec son score (None sans résultat)
+        """
+
+        results = [iterations for iterations in results if iterations]
+        if not results:
+            return None
+
+        # Un processus qui a prouvé une victoire ou une défaite s'est arrêté :
+        # son score vaut pour toutes les profondeurs
+        unfinished = [iterations[-1][0] for iterations in results
+                      if abs(iterations[-1][2]) < self.winScore]
+        self.depth = min(unfinished) if unfinished else max(iterations[-1][0] for iterations in results)
+
+        best = None
+        for iterations in results:  # Les processus dans l'ordre : égalités départagées par l'ordre des coups
+            depth, move, score = [it for it in iterations if it[0] <= self.depth][-1]
+            if best is None or score > best[1]:
+                best = (move, score)
+
+        return best
+
+    def searchTrees(self, state):
+        """
+        Fait grandir un arbre Monte-Carlo par processus puis additionne les
+        visites des coups de la racine
+
+        Entrées :
+            state [GameState] : état de la partie
+
+        Sorties :
+            [((line, column, direction), float)] : coup le plus visité avec sa part de victoires
+        """
+
+        deadline = time.monotonic() + self.timeLimit
+        valid = state.getValid()
+        if len(valid) <= 1:
+            return (valid[0], None) if valid else ((None, None, None), None)
+
+        data = packState(state)
+        pool = getPool(self.workers)
+        seeds = [self.seed + i for i in range(self.workers)]
+        self.seed += self.workers
+        results = list(pool.map(searchTree, [data]*self.workers,
+                                [deadline]*self.workers, seeds))
+
+        self.workerNodes = {}
+        visits = {move: [0, 0.0] for move in valid}
+        for pid, done, children in results:
+            self.workerNodes[pid] = self.workerNodes.get(pid, 0) + done
+            for move, (n, wins) in children.items():
+                visits[move][0] += n
+                visits[move][1] += wins
+        self.nodes = sum(self.workerNodes.values())
+        self.workerCounters["nodes"] = self.nodes
+
+        # Les égalités sont départagées par l'ordre de getValid
+        move = max(valid, key=lambda move: visits[move][0])
+        n, wins = visits[move]
+
+        return (move, wins/n if n else None)
@@ -2,7 +2,7 @@ import numpy as np
 import time
 import os
 
-from Config import *
+from Zobrist import History, hashBoard
 
 class Record():
     def __init__(self, app):
@@ -12,16 +12,22 @@ class Record():
         self.recording = False
         self.allBoards = None
         self.currentBoards = self.__initData()
+        self.history = self.__initHistory()
         self.fileName = time.strftime("%d-%m-%Y %Hh%Mm%Ss", time.localtime())
 
     def __initData(self):
         """Plateau initial"""
 
-        ml = [-1 for x in range(BOARD_SIZE-1)]
-        ca = [0 for l in range(BOARD_SIZE)]
-        mr = [-1 for x in range(BOARD_SIZE-1)]
+        return np.array([self.app.geometry.emptyBoard()], dtype=int)
 
-        return np.array([[ml + ca + mr for l in range(BOARD_SIZE)]], dtype=int)
+    def __initHistory(self):
+        """Positions de la partie en cours indexées par leur hash"""
+
+        history = History()
+        for board in self.currentBoards:
+            history.add(hashBoard(board, self.app.geometry), board.tobytes())
+
+        return history
 
     def startRecord(self):
         """Démarre l'enregistrement"""
@@ -42,11 +48,20 @@ class Record():
             self.allBoards.append(self.currentBoards)
 
         self.currentBoards = self.__initData()
+        self.history = self.__initHistory()
+
+    def addBoard(self, newData, h=None):
+        """
+        Ajoute un plateau
 
-    def addBoard(self, newData):
-        """Ajoute un plateau"""
+        Entrées :
+            newData [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+            h [int] : hash de Zobrist du plateau (calculé si absent)
+        """
 
         self.currentBoards = np.append(self.currentBoards, [newData], axis=0)
+        self.history.add(hashBoard(newData, self.app.geometry) if h is None else h,
+                         self.currentBoards[-1].tobytes())
         if self.recording:
             self.__save()
 
@@ -55,6 +70,11 @@ class Record():
 
         return self.currentBoards
 
+    def getHistory(self):
+        """Donne les positions de la partie en cours indexées par leur hash"""
+
+        return self.history
+
     def close(self):
         """Arrête l'enregistrement"""
 
@@ -66,6 +86,7 @@ class Record():
         
         playerMode = self.app.playerMode
         playerNames = self.app.getPlayerName()
+        variant = [self.app.geometry.size, self.app.geometry.toWin]
         path = os.getcwd() + '\\Replay'
         fullPath = path + "\\" + self.fileName
         if not os.path.isdir(path):
@@ -80,5 +101,5 @@ class Record():
             except Exception as e:
                 pass
 
-        np.save(fullPath, [playerMode, playerNames, self.allBoards])
+        np.save(fullPath, [playerMode, playerNames, self.allBoards, variant])
         os.rename(fullPath + ".npy", "Replay\\" + self.fileName + '.slideways')
@@ -1,5 +1,6 @@
 import numpy as np
 
+from Geometry import getGeometry
 
 class Replay():
     def __init__(self, filePath):
@@ -10,6 +11,8 @@ class Replay():
         self.playerMode = data[0]
         self.playerNames = data[1]
         self.boards = data[2]
+        # Les anciens enregistrements n'ont pas de variante : celle de Config
+        self.geometry = getGeometry(*data[3]) if len(data) > 3 else getGeometry()
         self.currentGame = 0
         self.current = 0
         self.score = [[]]
@@ -95,7 +98,8 @@ class Replay():
         """Donne le gagnant"""
 
         from App import playerWin  # Empêche l'import circulaire
-        draw, winner = playerWin(self.boards[self.currentGame][self.current])
+        draw, winner = playerWin(
+            self.boards[self.currentGame][self.current], self.geometry)
         if self.current >= len(self.score[self.currentGame]):
             if draw:
                 prev = self.score[self.currentGame][self.current -
@@ -0,0 +1,68 @@
+import json
+import os
+
+
+def formatStats(stats):
+    """
+    Résume les statistiques d'un coup de l'ia en une ligne (barre d'état)
+
+    Entrées :
+        stats [dict] : statistiques du coup (voir AI.moveStats)
+
+    Sorties :
+        [str] : résumé
+    """
+
+    if stats['source'] == 'book':
+        return 'AI {} : book move (depth {})'.format(stats['player'], stats['depth'])
+    if stats['source'] == 'store':
+        return 'AI {} : stored move (depth {})'.format(stats['player'], stats['depth'])
+    # Noeuds de chaque processus de ParallelAI
+    workers = ' (workers {})'.format('/'.join(str(n) for n in stats['workerNodes'])) \
+        if stats.get('workerNodes') else ''
+    if stats['source'] == 'mcts':
+        return 'AI {} : {} playouts{}, {:.0f} playouts/s, {:.2f} s'.format(
+            stats['player'], stats['nodes'], workers, stats['nps'], stats['time'])
+
+    parts = ['AI {} : depth {}'.format(stats['player'], stats['depth']),
+             '{} nodes{}'.format(stats['nodes'], workers),
+             '{:.1f} knps'.format(stats['nps']/1000),
+             '{} evals'.format(stats['evaluations'])]
+    if stats['probes']:
+        parts.append('TT {:.0%} of {}'.format(stats['hitRate'], stats['probes']))
+    parts.append('{} cutoffs'.format(stats['cutoffs']))
+    if stats['branching'] is not None:
+        parts.append('EBF {:.1f}'.format(stats['branching']))
+    parts.append('{:.2f} s'.format(stats['time']))
+    if stats['source'] == 'ponder':
+        parts.append('ponder hit')
+
+    return ', '.join(parts)
+
+
+class StatsLog():
+    def __init__(self, path):
+        """
+        Journal des statistiques des coups de l'ia : une ligne JSON par coup
+        ajoutée au fichier (à donner à App.addStatsHook)
+
+        Entrées :
+            path [str] : fichier du journal (créé si absent)
+        """
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.path = path
+
+    def __call__(self, stats):
+        """
+        Ajoute un coup au journal
+
+        Entrées :
+            stats [dict] : statistiques du coup (voir AI.moveStats)
+        """
+
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(stats) + '\n')
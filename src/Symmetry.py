@@ -0,0 +1,156 @@
+from Bitboard import Bitboard
+from Geometry import getGeometry
+
+
+# Une position garde la même valeur quand on inverse l'ordre des lignes (flip)
+# et quand on la retourne de gauche à droite (mirror) : les colonnes c deviennent
+# width-1-c, les décalages offset deviennent maxOffset-offset et les directions
+# sont inversées. Chaque symétrie est son propre inverse.
+TRANSFORMS = [(False, False), (True, False), (False, True), (True, True)]
+
+
+def reverseRow(row, width):
+    """
+    Retourne les bits d'une ligne de gauche à droite
+
+    Entrées :
+        row [int] : cases d'une ligne (bit c pour la colonne c)
+        width [int] : nombre de colonnes
+
+    Sorties :
+        [int] : ligne retournée
+    """
+
+    return int(format(row, '0{}b'.format(width))[::-1], 2)
+
+
+def transformKey(board, transform):
+    """
+    Applique une symétrie à un plateau sans construire le plateau
+
+    Entrées :
+        board [Bitboard] : plateau
+        transform [(bool, bool)] : symétrie (flip, mirror)
+
+    Sorties :
+        [(int, int, (int,...))] : clé du plateau transformé (voir Bitboard.key)
+    """
+
+    flip, mirror = transform
+    if not flip and not mirror:
+        return board.key()
+
+    geometry = board.geometry
+    size, stride, width, rowMask = geometry.size, geometry.stride, geometry.width, geometry.rowMask
+
+    masks = [0, 0, 0]
+    offsets = [0 for l in range(size)]
+    for line in range(size):
+        target = size-1-line if flip else line
+        offset = board.offsets[line]
+        offsets[target] = geometry.maxOffset-offset if mirror else offset
+
+        for playerNumber in [1, 2]:
+            row = board.masks[playerNumber] >> (line*stride) & rowMask
+            if mirror:
+                row = reverseRow(row, width)
+            masks[playerNumber] |= row << (target*stride)
+
+    return (masks[1], masks[2], tuple(offsets))
+
+
+def transformBoard(board, transform):
+    """
+    Applique une symétrie à un plateau
+
+    Entrées :
+        board [Bitboard] : plateau
+        transform [(bool, bool)] : symétrie (flip, mirror)
+
+    Sorties :
+        [Bitboard] : plateau transformé
+    """
+
+    mask1, mask2, offsets = transformKey(board, transform)
+
+    return Bitboard([0, mask1, mask2], offsets, geometry=board.geometry)
+
+
+def transformMove(move, transform, geometry=None):
+    """
+    Applique une symétrie à un coup (la même fonction ramène le coup dans le repère d'origine)
+
+    Entrées :
+        move [(line, column, direction)] : coup
+        transform [(bool, bool)] : symétrie (flip, mirror)
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [(line, column, direction)] : coup transformé
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    flip, mirror = transform
+    line, column, direction = move
+
+    if flip and line != None:
+        line = geometry.size-1-line
+    if mirror:
+        if column != None:
+            column = geometry.width-1-column
+        if direction != None:
+            direction = -direction
+
+    return (line, column, direction)
+
+
+def transformPlay(last_play, transform, geometry=None):
+    """
+    Applique une symétrie au dernier coup joué
+
+    Entrées :
+        last_play [{"line", "column", "direction"}] : dernier coup joué
+        transform [(bool, bool)] : symétrie (flip, mirror)
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [{"line", "column", "direction"}] : dernier coup transformé
+    """
+
+    line, column, direction = transformMove(
+        (last_play["line"], last_play["column"], last_play["direction"]), transform, geometry)
+
+    return {"line": line, "column": column, "direction": direction}
+
+
+def canonical(board, last_play=None, geometry=None):
+    """
+    Donne la clé commune à toutes les positions symétriques d'une position.
+    Le dernier coup en fait partie : il interdit certains coups au joueur suivant.
+
+    Entrées :
+        board [Bitboard ou [[int,int,...],...]] : plateau
+        last_play [{"line", "column", "direction"}] : dernier coup joué
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [(tuple, (bool, bool))] : (clé canonique, symétrie qui donne la clé) ;
+            transformMove(coup, symétrie) ramène un coup de la clé vers le plateau
+    """
+
+    if not isinstance(board, Bitboard):
+        board = Bitboard.fromArray(board, geometry)
+    geometry = board.geometry
+
+    if last_play is None:
+        last_play = {"line": None, "column": None, "direction": None}
+    move = (last_play["line"], last_play["column"], last_play["direction"])
+
+    best = None
+    for transform in TRANSFORMS:
+        key = transformKey(board, transform) + \
+            (transformMove(move, transform, geometry),)
+        if best is None or key < best[0]:
+            best = (key, transform)
+
+    return best
@@ -0,0 +1,228 @@
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Config import *
+from AI import AI
+from GameState import GameState
+from Geometry import getGeometry
+
+
+def parseEngine(spec):
+    """
+    Lit la description d'une ia : mode puis réglages, par exemple
+    -3, -2:time=0.2 ou -5:depth=4,book=0
+
+    Entrées :
+        spec [str] : description de l'ia
+
+    Sorties :
+        [dict] : mode et réglages (time : temps par coup, depth : profondeur
+            maximale, sinon attribut de AI)
+    """
+
+    mode, _, options = spec.partition(':')
+    engine = {'mode': int(mode)}
+
+    for option in options.split(',') if options else []:
+        key, _, value = option.partition('=')
+        engine[key] = float(value) if '.' in value else int(value)
+
+    return engine
+
+
+def createAi(engine, geometry):
+    """
+    Crée l'ia d'une description (voir parseEngine)
+
+    Entrées :
+        engine [dict] : mode et réglages
+        geometry [Geometry] : variante du plateau
+
+    Sorties :
+        [AI] : ia sans partie (pas de ponder)
+    """
+
+    # Une profondeur donnée sans temps rend les parties reproductibles
+    timeLimit = engine.get('time', INFINITE if 'depth' in engine else AI_TIME-AI_MARGIN)
+    ai = AI(None, timeLimit, geometry=geometry)
+    ai.mode = engine['mode']
+    ai.maxDepth = engine.get('depth')
+
+    for key, value in engine.items():
+        if key in ['mode', 'time', 'depth']:
+            continue
+        if not hasattr(ai, key):
+            raise ValueError('Unknown AI setting: {}'.format(key))
+        setattr(ai, key, value)
+
+    return ai
+
+
+def playGame(engines, seed, variant=(BOARD_SIZE, NUMBER_CASE_TO_WIN), opening=TOURNAMENT_OPENING,
+             maxMoves=TOURNAMENT_MOVES):
+    """
+    Joue une partie entre deux ia (dans un processus du tournoi)
+
+    Entrées :
+        engines [[dict, dict]] : ia du joueur 1 et du joueur 2 (voir parseEngine)
+        seed [int] : graine des premiers coups joués au hasard et des ia
+        variant [(int, int)] : taille du plateau et cases pour gagner
+        opening [int] : premiers coups joués au hasard
+        maxMoves [int] : coups maximum (nulle au-delà)
+
+    Sorties :
+        [(int, int, [[float], [float]])] : gagnant (0 pour une nulle), nombre de
+            coups et temps de chaque coup de chaque joueur (s)
+    """
+
+    geometry = getGeometry(*variant)
+    generator = random.Random(seed)
+    random.seed(seed)
+
+    state = GameState(geometry=geometry)
+    ais = [createAi(engine, geometry) for engine in engines]
+    times = [[], []]
+
+    moves = 0
+    while moves < maxMoves and state.getWinner() == (False, None):
+        valid = state.getValid()
+        if not valid:
+            break
+
+        if moves < opening:
+            move = generator.choice(valid)
+        else:
+            playerNumber = state.playerNumber
+            startTime = time.perf_counter()
+            move = ais[playerNumber-1].chooseMove(state.copy())[0]
+            times[playerNumber-1].append(time.perf_counter() - startTime)
+
+        state.make(move)
+        moves += 1
+
+    draw, winner = state.getWinner()
+
+    return (0 if draw or winner is None else winner), moves, times
+
+
+def elo(wins, draws, losses):
+    """
+    Donne la différence d'Elo correspondant à un score, avec son intervalle
+    de confiance à 95 % (loi normale du score moyen par partie)
+
+    Entrées :
+        wins [int] : victoires
+        draws [int] : nulles
+        losses [int] : défaites
+
+    Sorties :
+        [(float, float, float)] : différence, borne basse et borne haute (infinies
+            pour un score de 0 ou 100 %)
+    """
+
+    games = wins + draws + losses
+    score = (wins + draws/2)/games
+    variance = (wins*(1 - score)**2 + draws*(0.5 - score)**2 + losses*score**2)/games
+    margin = 1.96*math.sqrt(variance/games)
+
+    def difference(score):
+        if score <= 0:
+            return -math.inf
+        if score >= 1:
+            return math.inf
+        return 400*math.log10(score/(1 - score))
+
+    return difference(score), difference(score - margin), difference(score + margin)
+
+
+def match(first, second, games=TOURNAMENT_GAMES, workers=TOURNAMENT_WORKERS, seed=0,
+          variant=(BOARD_SIZE, NUMBER_CASE_TO_WIN)):
+    """
+    Joue games parties entre deux ia sur des processus : chaque graine est
+    jouée avec les deux couleurs, puis affiche le résultat de la première
+
+    Entrées :
+        first [str] : description de la première ia (voir parseEngine)
+        second [str] : description de la deuxième ia
+        games [int] : nombre de parties (arrondi au nombre pair supérieur)
+        workers [int] : nombre de processus (0 : un par coeur)
+        seed [int] : graine de la première partie
+        variant [(int, int)] : taille du plateau et cases pour gagner
+
+    Sorties :
+        [(int, int, int)] : victoires, nulles et défaites de la première ia
+    """
+
+    engines = [parseEngine(first), parseEngine(second)]
+    for engine in engines:
+        createAi(dict(engine, depth=1), getGeometry(*variant))  # Réglages inconnus signalés avant les parties
+
+    # Partie 2*i : la première ia a les blancs, partie 2*i+1 : les noirs, même graine
+    pairs = [(engines if i % 2 == 0 else engines[::-1], seed + i//2) for i in range(games + games % 2)]
+
+    workers = workers if workers else os.cpu_count()
+    startTime = time.monotonic()
+    # spawn : comme Parallel.getPool, rien de la partie n'est copié dans les processus
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        results = list(pool.map(playGame, *zip(*pairs), [variant]*len(pairs)))
+    elapsed = time.monotonic() - startTime
+
+    score = [0, 0, 0]  # Victoires, nulles, défaites de la première ia
+    times = [[], []]
+    plies = 0
+    for i, (winner, moves, gameTimes) in enumerate(results):
+        firstPlayer = 1 if i % 2 == 0 else 2
+        score[1 if winner == 0 else 0 if winner == firstPlayer else 2] += 1
+        times[0] += gameTimes[firstPlayer-1]
+        times[1] += gameTimes[2-firstPlayer]
+        plies += moves
+
+    difference, low, high = elo(*score)
+    print('{} vs {} : {} games, {} workers, {:.1f} moves per game'.format(
+        first, second, len(results), workers, plies/len(results)))
+    print('  W {} D {} L {}, score {:.1%}, Elo {:+.0f} [{:+.0f}, {:+.0f}]'.format(
+        *score, (score[0] + score[1]/2)/len(results), difference, low, high))
+    for spec, moveTimes in zip([first, second], times):
+        if moveTimes:
+            print('  {} : {:.3f} s per move (max {:.3f} s)'.format(
+                spec, sum(moveTimes)/len(moveTimes), max(moveTimes)))
+    print('  {:.2f} games/s ({:.1f} s)'.format(len(results)/elapsed, elapsed))
+
+    return tuple(score)
+
+
+def tournament(specs, games=TOURNAMENT_GAMES, workers=TOURNAMENT_WORKERS, seed=0,
+               variant=(BOARD_SIZE, NUMBER_CASE_TO_WIN)):
+    """
+    Joue un match entre chaque paire d'ia (voir match)
+
+    Entrées :
+        specs [[str]] : descriptions des ia (voir parseEngine)
+        games [int] : parties par paire
+        workers [int] : nombre de processus (0 : un par coeur)
+        seed [int] : graine de la première partie de chaque match
+        variant [(int, int)] : taille du plateau et cases pour gagner
+
+    Sorties :
+        [{(str, str): (int, int, int)}] : victoires, nulles et défaites de la première ia de chaque paire
+    """
+
+    results = {}
+    for i, first in enumerate(specs):
+        for second in specs[i+1:]:
+            results[(first, second)] = match(first, second, games, workers, seed, variant)
+
+    return results
+
+
+if __name__ == '__main__':
+    # python3 src/Tournament.py [games] engine engine [engine...]
+    # engine : mode[:réglage=valeur,...], par exemple -3, -2:time=0.2 ou -5:depth=4,book=0
+    args = sys.argv[1:]
+    games = int(args.pop(0)) if args and args[0].isdigit() else TOURNAMENT_GAMES
+    tournament(args if len(args) > 1 else ['-2', '-3'], games)
@@ -0,0 +1,332 @@
+import atexit
+import struct
+from multiprocessing import shared_memory
+
+from Config import *
+
+
+# Type de score d'une entrée
+EXACT = 0
+LOWER = 1  # Le score réel est >= score (coupure beta)
+UPPER = 2  # Le score réel est <= score (aucun coup n'a dépassé alpha)
+
+# Champs d'une entrée (tuple)
+HASH, DEPTH, FLAG, SCORE, MOVE, AGE = range(6)
+
+
+class TranspositionTable():
+    def __init__(self, entries=TT_ENTRIES):
+        """
+        Initialise une table de taille fixe : chaque hash a deux places, l'une
+        garde l'entrée la plus profonde, l'autre la dernière entrée rangée
+
+        Entrées :
+            entries [int] : nombre d'entrées (pair)
+        """
+
+        self.buckets = max(1, entries // 2)
+        self.table = [None] * (2*self.buckets)
+        self.age = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.table)
+
+    def newSearch(self):
+        """Commence une nouvelle recherche : les entrées plus anciennes peuvent être remplacées"""
+
+        self.age += 1
+
+    def clear(self):
+        """Vide la table et remet les compteurs à zéro"""
+
+        self.table = [None] * (2*self.buckets)
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def probe(self, h):
+        """
+        Cherche une position
+
+        Entrées :
+            h [int] : hash de la position
+
+        Sorties :
+            [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None
+        """
+
+        i = (h % self.buckets)*2
+        table = self.table
+
+        entry = table[i]
+        if entry is not None and entry[HASH] == h:
+            self.hits += 1
+            return entry
+
+        entry = table[i+1]
+        if entry is not None and entry[HASH] == h:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def peek(self, h):
+        """
+        Cherche une position sans compter la recherche (voir probe)
+
+        Entrées :
+            h [int] : hash de la position
+
+        Sorties :
+            [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None
+        """
+
+        i = (h % self.buckets)*2
+        for entry in self.table[i:i+2]:
+            if entry is not None and entry[HASH] == h:
+                return entry
+
+        return None
+
+    def store(self, h, depth, flag, score, move):
+        """
+        Range une position
+
+        Entrées :
+            h [int] : hash de la position
+            depth [int] : profondeur de la recherche
+            flag [EXACT, LOWER ou UPPER] : type du score
+            score [int] : score
+            move [(line, column, direction)] : meilleur coup
+        """
+
+        i = (h % self.buckets)*2
+        table = self.table
+        entry = (h, depth, flag, score, move, self.age)
+        self.stores += 1
+
+        deep = table[i]
+        if deep is None or deep[HASH] == h or deep[AGE] != self.age or depth >= deep[DEPTH]:
+            table[i] = entry
+            if table[i+1] is not None and table[i+1][HASH] == h:
+                table[i+1] = None  # Une seule entrée par position
+        else:
+            table[i+1] = entry
+
+    def hitRate(self):
+        """Donne la part des recherches trouvées dans la table"""
+
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+QWORD = struct.Struct('<Q')
+DOUBLE = struct.Struct('<d')
+
+
+def packMove(move):
+    """
+    Code un coup sur 13 bits (0 pour aucun coup)
+
+    Entrées :
+        move [(line, column, direction)] : coup (ou None)
+
+    Sorties :
+        [int] : coup codé
+    """
+
+    if move is None:
+        return 0
+
+    line, column, direction = move
+    return 1 | line << 1 | (0 if column is None else column+1) << 5 | (0 if direction is None else direction+2) << 11
+
+
+def unpackMove(code):
+    """Décode un coup codé par packMove"""
+
+    if not code:
+        return None
+
+    column = (code >> 5 & 63) - 1
+    direction = (code >> 11) - 2
+
+    return (code >> 1 & 15, None if column < 0 else column, None if direction < -1 else direction)
+
+
+class SharedTranspositionTable(TranspositionTable):
+    def __init__(self, entries=TT_ENTRIES, name=None):
+        """
+        Initialise une table de transposition en mémoire partagée entre processus.
+        Chaque entrée est faite de trois mots de 64 bits : (hash ^ data ^ score,
+        data, score) ; une entrée écrite en même temps par deux processus ne
+        redonne pas son hash et est ignorée, sans verrou.
+
+        Entrées :
+            entries [int] : nombre d'entrées (pair), pour créer la table
+            name [str] : nom de la table à ouvrir (créée si absent)
+        """
+
+        self.owner = name is None
+        if self.owner:
+            buckets = max(1, entries // 2)
+            self.memory = shared_memory.SharedMemory(create=True, size=8*(1 + 6*buckets))
+        else:
+            # Les processus de recherche partagent le suivi des ressources du
+            # processus qui a créé la table : lui seul la libère (close)
+            self.memory = shared_memory.SharedMemory(name=name)
+
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast('Q')  # Mot 0 : âge de la recherche, puis les entrées
+        self.buckets = (len(self.words) - 1) // 6
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        atexit.register(self.close)
+
+    def __len__(self):
+        return sum(self.read(i) is not None for i in range(2*self.buckets))
+
+    @property
+    def age(self):
+        return self.words[0]
+
+    def newSearch(self):
+        """Commence une nouvelle recherche (seul le processus qui a créé la table compte les recherches)"""
+
+        if self.owner:
+            self.words[0] = (self.words[0] + 1) & 255
+
+    def clear(self):
+        """Vide la table et remet les compteurs à zéro"""
+
+        self.memory.buf[:] = bytes(len(self.memory.buf))
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def close(self):
+        """Ferme la table (et la libère dans le processus qui l'a créée)"""
+
+        if self.words is None:
+            return
+
+        self.words.release()
+        self.words = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def read(self, i, h=None):
+        """
+        Lit une entrée
+
+        Entrées :
+            i [int] : indice de l'entrée
+            h [int] : hash attendu (celui de l'entrée si absent)
+
+        Sorties :
+            [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None si vide, autre position ou écriture en cours
+        """
+
+        words = self.words
+        k = 1 + 3*i
+        check, data, score = words[k], words[k+1], words[k+2]
+        if not data:
+            return None
+
+        key = check ^ data ^ score
+        if h is not None and key != h:
+            return None
+
+        return (key, data & 0xffff, data >> 16 & 3, DOUBLE.unpack(QWORD.pack(score))[0],
+                unpackMove(data >> 26 & 0x1fff), data >> 18 & 255)
+
+    def write(self, i, entry):
+        """
+        Ecrit une entrée
+
+        Entrées :
+            i [int] : indice de l'entrée
+            entry [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None pour la vider
+        """
+
+        words = self.words
+        k = 1 + 3*i
+        if entry is None:
+            words[k+1] = 0
+            return
+
+        h, depth, flag, score, move, age = entry
+        data = 1 << 63 | packMove(move) << 26 | age << 18 | flag << 16 | depth
+        score = QWORD.unpack(DOUBLE.pack(score))[0]
+        words[k] = h ^ data ^ score
+        words[k+1] = data
+        words[k+2] = score
+
+    def probe(self, h):
+        """
+        Cherche une position
+
+        Entrées :
+            h [int] : hash de la position
+
+        Sorties :
+            [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None
+        """
+
+        entry = self.peek(h)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def peek(self, h):
+        """
+        Cherche une position sans compter la recherche (voir probe)
+
+        Entrées :
+            h [int] : hash de la position
+
+        Sorties :
+            [tuple] : entrée (HASH, DEPTH, FLAG, SCORE, MOVE, AGE) ou None
+        """
+
+        i = (h % self.buckets)*2
+
+        return self.read(i, h) or self.read(i+1, h)
+
+    def store(self, h, depth, flag, score, move):
+        """
+        Range une position
+
+        Entrées :
+            h [int] : hash de la position
+            depth [int] : profondeur de la recherche
+            flag [EXACT, LOWER ou UPPER] : type du score
+            score [int] : score
+            move [(line, column, direction)] : meilleur coup
+        """
+
+        i = (h % self.buckets)*2
+        age = self.age
+        entry = (h, depth, flag, score, move, age)
+        self.stores += 1
+
+        deep = self.read(i)
+        if deep is None or deep[HASH] == h or deep[AGE] != age or depth >= deep[DEPTH]:
+            self.write(i, entry)
+            if self.read(i+1, h) is not None:
+                self.write(i+1, None)  # Une seule entrée par position
+        else:
+            self.write(i+1, entry)
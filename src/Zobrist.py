@@ -0,0 +1,109 @@
+import numpy as np
+
+from Geometry import getGeometry
+
+
+def hashBoard(board, geometry=None):
+    """
+    Calcule le hash de Zobrist d'un plateau
+
+    Entrées :
+        board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [int] : hash du plateau
+    """
+
+    geometry = getGeometry() if geometry is None else geometry
+    board = np.asarray(board)
+    lines, columns = np.indices(board.shape)
+
+    return int(np.bitwise_xor.reduce(geometry.zobrist[board+1, lines, columns], axis=None))
+
+
+def hashCoup(h, board, line=None, column=None, playerNumber=None, direction=None, geometry=None):
+    """
+    Met à jour le hash pour un coup, à appeler avant de jouer le coup (App.coup)
+
+    Entrées :
+        h [int] : hash du plateau
+        board [[int,int,...],[int,int,...],...] : listes de listes représentant le plateau
+        line [int] : coordonnée de la ligne
+        column [int] : coordonnée de la colonne
+        playerNumber [int] : numéro du joueur
+        direction [+1 ou -1] : direction du décalage
+        geometry [Geometry] : variante du plateau (celle de Config si absente)
+
+    Sorties :
+        [int] : hash du plateau après le coup
+    """
+
+    keys = (getGeometry() if geometry is None else geometry).zobristKeys
+
+    if line != None and column != None and playerNumber != None:  # Coordonnées case
+
+        h ^= keys[board[line][column]+1][line][column] ^ keys[playerNumber+1][line][column]
+
+    elif line != None and direction != None:  # Décalage
+
+        row = board[line]
+        width = len(row)
+        for c in range(width):
+            value = row[c]
+            if value:
+                h ^= keys[value+1][line][c] ^ keys[value+1][line][(c+direction) % width]
+
+    return h
+
+
+class History():
+    def __init__(self):
+        """Initialise l'ensemble des positions déjà jouées"""
+
+        self.positions = {}
+
+    def __len__(self):
+        return sum(len(keys) for keys in self.positions.values())
+
+    def add(self, h, key):
+        """
+        Ajoute une position
+
+        Entrées :
+            h [int] : hash de la position
+            key [object] : clé complète de la position (comparée en cas de collision)
+        """
+
+        self.positions.setdefault(h, []).append(key)
+
+    def remove(self, h):
+        """
+        Retire la dernière position ajoutée avec ce hash
+
+        Entrées :
+            h [int] : hash de la position
+        """
+
+        keys = self.positions[h]
+        keys.pop()
+        if not keys:
+            del self.positions[h]
+
+    def contains(self, h, makeKey):
+        """
+        Vérifie si une position a déjà été jouée
+
+        Entrées :
+            h [int] : hash de la position
+            makeKey [function] : construit la clé complète, appelée seulement si le hash est connu
+
+        Sorties :
+            [bool] : position déjà jouée
+        """
+
+        keys = self.positions.get(h)
+        if keys is None:
+            return False
+
+        return makeKey() in keys